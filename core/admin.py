@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import *
+from . import catalog, homepage, matching, ranking, taskqueue, tasks
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -9,11 +10,22 @@ class UserProfileAdmin(admin.ModelAdmin):
     actions = ['ban_users', 'unban_users', 'verify_users']
     
     def ban_users(self, request, queryset):
+        user_ids = list(queryset.values_list('user_id', flat=True))
+        newly_banned = list(queryset.filter(is_banned=False).values_list('points', flat=True))
         queryset.update(is_banned=True)
+        matching.remove_user_matches(user_ids)
+        ranking.apply([(points, -1) for points in newly_banned])
+        # update() sends no post_save; the home page lists recent public profiles
+        homepage.invalidate_recent_profiles()
     ban_users.short_description = "Ban selected users"
     
     def unban_users(self, request, queryset):
+        unbanned = list(queryset.filter(is_banned=True).values_list('user_id', 'points'))
         queryset.update(is_banned=False)
+        for user_id, points in unbanned:
+            tasks.refresh_matches.delay(user_id)
+        ranking.apply([(points, 1) for _, points in unbanned])
+        homepage.invalidate_recent_profiles()
     unban_users.short_description = "Unban selected users"
     
     def verify_users(self, request, queryset):
@@ -29,10 +41,13 @@ class SkillAdmin(admin.ModelAdmin):
     
     def approve_skills(self, request, queryset):
         queryset.update(is_approved=True)
+        # update() sends no post_save, so invalidate the skill catalog here
+        catalog.bump_on_commit()
     approve_skills.short_description = "Approve selected skills"
     
     def reject_skills(self, request, queryset):
         queryset.update(is_approved=False)
+        catalog.bump_on_commit()
     reject_skills.short_description = "Reject selected skills"
 
 @admin.register(SwapRequest)
@@ -62,3 +77,14 @@ class AdminMessageAdmin(admin.ModelAdmin):
 admin.site.register(UserSkill)
 admin.site.register(Achievement)
 admin.site.register(UserAchievement)
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'last_error']
+    actions = ['retry_tasks']
+    
+    def retry_tasks(self, request, queryset):
+        taskqueue.retry_failed(queryset)
+    retry_tasks.short_description = "Retry selected failed tasks"
@@ -0,0 +1,235 @@
+"""
+Event-driven achievement awarding.
+
+Activity is folded into per-user UserStats counters shortly after it
+happens, on a task worker (a swap completes, a message is sent, a rating
+is left, ...; see core.tasks). Each event bumps a
+few counters with one UPDATE, re-reads that single stats row and checks
+only the rules that depend on the bumped counters, so awarding costs a
+constant number of queries no matter how much history a user has.
+
+backfill() recomputes every counter from history in user chunks, for
+existing data or after rules change.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Achievement, Message, PointsTransaction, Rating, SwapRequest, UserAchievement, UserSkill, UserStats
+
+POSITIVE_RATING = 4
+
+COUNTERS = [
+    'swaps_completed', 'swaps_taught', 'swaps_learned', 'skills_learned', 'skills_offered',
+    'chat_partners', 'ratings_received', 'rating_sum', 'positive_ratings', 'requests_sent', 'requesters',
+]
+
+# Achievement name -> (counters the rule reads, predicate over a UserStats row).
+# Names match the achievements seeded by populate_data.
+RULES = {
+    'First Swap': (('swaps_completed',), lambda s: s.swaps_completed >= 1),
+    'Skill Master': (('skills_offered',), lambda s: s.skills_offered >= 5),
+    'Social Butterfly': (('chat_partners',), lambda s: s.chat_partners >= 10),
+    # Both sides of a swap teach and learn; the role is who asked. The receiver
+    # was sought out for their skill, the requester set out to learn
+    'Teacher': (('swaps_taught',), lambda s: s.swaps_taught >= 10),
+    'Student': (('swaps_learned',), lambda s: s.swaps_learned >= 10),
+    'Community Helper': (('positive_ratings',), lambda s: s.positive_ratings >= 50),
+    'Popular Teacher': (('requesters',), lambda s: s.requesters >= 20),
+    'Dedicated Learner': (('requests_sent',), lambda s: s.requests_sent >= 25),
+    'Five Star Teacher': (
+        ('ratings_received', 'rating_sum'),
+        lambda s: s.ratings_received >= 10 and s.rating_sum == 5 * s.ratings_received,
+    ),
+    'Skill Collector': (('skills_learned',), lambda s: s.skills_learned >= 15),
+}
+
+# Counter -> names of the rules to re-check when it changes
+RULES_BY_COUNTER = {}
+for rule_name, (rule_counters, _) in RULES.items():
+    for counter in rule_counters:
+        RULES_BY_COUNTER.setdefault(counter, []).append(rule_name)
+
+_achievement_ids = None
+
+
+def achievement_ids():
+    """{name: id} of seeded achievements, cached per process"""
+    global _achievement_ids
+    if _achievement_ids is None:
+        _achievement_ids = dict(Achievement.objects.filter(name__in=RULES).values_list('name', 'id'))
+    return _achievement_ids
+
+
+def clear_cache():
+    global _achievement_ids
+    _achievement_ids = None
+
+
+def earned(stats, rule_names):
+    """Names among rule_names whose predicate holds for a stats row"""
+    return [name for name in rule_names if RULES[name][1](stats)]
+
+
+def grant(user_id, names):
+    ids = achievement_ids()
+    UserAchievement.objects.bulk_create(
+        [UserAchievement(user_id=user_id, achievement_id=ids[name]) for name in names if name in ids],
+        ignore_conflicts=True,
+    )
+
+
+def record(user_id, **increments):
+    """Apply counter increments for one user and award whatever they unlock"""
+    increments = {counter: delta for counter, delta in increments.items() if delta}
+    if not increments:
+        return
+    with transaction.atomic():
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(
+            **{counter: F(counter) + delta for counter, delta in increments.items()}
+        )
+        stats = UserStats.objects.get(user_id=user_id)
+        candidates = {name for counter in increments for name in RULES_BY_COUNTER.get(counter, [])}
+        grant(user_id, earned(stats, candidates))
+
+
+# Events. They run on a task worker after the fact, so "before" means an
+# earlier primary key: rows created since must not make an event look repeated.
+# Swaps are completed in any order, so for them it is the primary key of the
+# swap_completed ledger row, written when the swap was completed.
+
+def swap_completed(swap_request):
+    completed_at = dict(
+        PointsTransaction.objects.filter(swap_request=swap_request, reason='swap_completed')
+        .values_list('user_id', 'pk')
+    )
+    # The requester teaches skill_offered and learns skill_wanted; the receiver the reverse
+    for user_id, learned_skill_id, role in (
+        (swap_request.requester_id, swap_request.skill_wanted_id, 'swaps_learned'),
+        (swap_request.receiver_id, swap_request.skill_offered_id, 'swaps_taught'),
+    ):
+        learned_before = SwapRequest.objects.filter(
+            Q(requester_id=user_id, skill_wanted_id=learned_skill_id) |
+            Q(receiver_id=user_id, skill_offered_id=learned_skill_id)
+        ).filter(
+            points_transactions__user_id=user_id,
+            points_transactions__reason='swap_completed',
+            points_transactions__pk__lt=completed_at[user_id],
+        ).exists()
+        record(user_id, swaps_completed=1, skills_learned=0 if learned_before else 1, **{role: 1})
+
+
+def message_sent(message):
+    talked_before = Message.objects.filter(
+        Q(sender_id=message.sender_id, receiver_id=message.receiver_id) |
+        Q(sender_id=message.receiver_id, receiver_id=message.sender_id)
+    ).filter(pk__lt=message.pk).exists()
+    if not talked_before:
+        record(message.sender_id, chat_partners=1)
+        record(message.receiver_id, chat_partners=1)
+
+
+def rating_received(rating):
+    record(
+        rating.rated_user_id,
+        ratings_received=1,
+        rating_sum=rating.rating,
+        positive_ratings=1 if rating.rating >= POSITIVE_RATING else 0,
+    )
+
+
+def swap_requested(swap_request):
+    requested_before = SwapRequest.objects.filter(
+        requester_id=swap_request.requester_id, receiver_id=swap_request.receiver_id
+    ).filter(pk__lt=swap_request.pk).exists()
+    record(swap_request.requester_id, requests_sent=1)
+    if not requested_before:
+        record(swap_request.receiver_id, requesters=1)
+
+
+def offered_skills_changed(user_id, delta):
+    record(user_id, skills_offered=delta)
+
+
+# Backfill
+
+def _count_by(queryset, key, **aggregate):
+    return dict(queryset.values(key).annotate(**aggregate).values_list(key, *aggregate))
+
+
+def compute_stats(user_ids):
+    """{user_id: {counter: value}} computed from history for a chunk of users"""
+    stats = {user_id: dict.fromkeys(COUNTERS, 0) for user_id in user_ids}
+
+    completed = SwapRequest.objects.filter(status='completed')
+    learned = {user_id: set() for user_id in user_ids}
+    for user_id, skill_id in completed.filter(requester_id__in=user_ids).values_list('requester_id', 'skill_wanted_id'):
+        stats[user_id]['swaps_completed'] += 1
+        stats[user_id]['swaps_learned'] += 1
+        learned[user_id].add(skill_id)
+    for user_id, skill_id in completed.filter(receiver_id__in=user_ids).values_list('receiver_id', 'skill_offered_id'):
+        stats[user_id]['swaps_completed'] += 1
+        stats[user_id]['swaps_taught'] += 1
+        learned[user_id].add(skill_id)
+
+    partners = {user_id: set() for user_id in user_ids}
+    for sender_id, receiver_id in Message.objects.filter(
+        Q(sender_id__in=user_ids) | Q(receiver_id__in=user_ids)
+    ).order_by().values_list('sender_id', 'receiver_id').distinct():
+        if sender_id in partners:
+            partners[sender_id].add(receiver_id)
+        if receiver_id in partners:
+            partners[receiver_id].add(sender_id)
+
+    offered = _count_by(UserSkill.objects.filter(user_id__in=user_ids, skill_type='offered'), 'user_id', n=Count('id'))
+    ratings = Rating.objects.filter(rated_user_id__in=user_ids).values('rated_user_id').annotate(
+        n=Count('id'), total=Sum('rating'), positive=Count('id', filter=Q(rating__gte=POSITIVE_RATING))
+    )
+    ratings = {row['rated_user_id']: row for row in ratings}
+    sent = _count_by(SwapRequest.objects.filter(requester_id__in=user_ids), 'requester_id', n=Count('id'))
+    requesters = _count_by(
+        SwapRequest.objects.filter(receiver_id__in=user_ids), 'receiver_id', n=Count('requester_id', distinct=True)
+    )
+
+    for user_id, counters in stats.items():
+        counters['skills_learned'] = len(learned[user_id])
+        counters['chat_partners'] = len(partners[user_id])
+        counters['skills_offered'] = offered.get(user_id, 0)
+        rating = ratings.get(user_id, {})
+        counters['ratings_received'] = rating.get('n', 0)
+        counters['rating_sum'] = rating.get('total') or 0
+        counters['positive_ratings'] = rating.get('positive', 0)
+        counters['requests_sent'] = sent.get(user_id, 0)
+        counters['requesters'] = requesters.get(user_id, 0)
+    return stats
+
+
+def backfill(user_queryset, batch_size=500, stdout=None):
+    """Recompute counters and award achievements for users in pk chunks; returns (users, awards)"""
+    users = awards = 0
+    last_pk = 0
+    while True:
+        user_ids = list(user_queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not user_ids:
+            return users, awards
+        last_pk = user_ids[-1]
+        computed = compute_stats(user_ids)
+        with transaction.atomic():
+            UserStats.objects.filter(user_id__in=user_ids).delete()
+            rows = UserStats.objects.bulk_create(
+                [UserStats(user_id=user_id, **counters) for user_id, counters in computed.items()]
+            )
+            before = UserAchievement.objects.filter(user_id__in=user_ids).count()
+            ids = achievement_ids()
+            UserAchievement.objects.bulk_create(
+                [
+                    UserAchievement(user_id=stats.user_id, achievement_id=ids[name])
+                    for stats in rows
+                    for name in earned(stats, RULES) if name in ids
+                ],
+                ignore_conflicts=True,
+            )
+            awards += UserAchievement.objects.filter(user_id__in=user_ids).count() - before
+        users += len(user_ids)
+        if stdout is not None:
+            stdout.write(f'Processed {users} users...')
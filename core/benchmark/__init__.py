@@ -0,0 +1,20 @@
+"""
+Benchmarks at production scale.
+
+* core.benchmark.data fills the database with synthetic users, skills,
+  swaps, ratings and messages using batched bulk inserts
+  (manage.py generate_benchmark_data).
+* core.benchmark.runner requests every page in core.urls through the
+  test client and reports latency percentiles, query counts and peak
+  memory as JSON (manage.py benchmark_views).
+"""
+import statistics
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'mean': statistics.fmean(ordered)}
@@ -0,0 +1,234 @@
+"""
+Synthetic data for benchmarks.
+
+Rows are built in memory and written with bulk_create in batches, so
+millions of rows take minutes rather than hours and memory stays bounded
+by the batch size. bulk_create sends no signals; the caller rebuilds the
+derived tables (inbox threads, rating aggregates, search documents,
+matches, leaderboards, achievements) afterwards with the usual
+maintenance commands. Skill summaries are written with each profile.
+
+Generated users are named bench0000001, bench0000002, ... and share one
+password, so a run can log in as any of them and clear() can find them.
+"""
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from ..models import Message, PointsTransaction, Rating, Skill, SwapRequest, UserProfile, UserSkill
+from ..points import SWAP_COMPLETION_POINTS
+
+USERNAME_PREFIX = 'bench'
+PASSWORD = 'benchmark'
+
+# Production-scale volumes; generate_benchmark_data --scale shrinks them
+VOLUMES = {
+    'users': 100_000,
+    'user_skills': 1_000_000,
+    'swaps': 500_000,
+    'ratings': 300_000,
+    'messages': 5_000_000,
+}
+
+# Share of swaps in each status
+SWAP_STATUSES = [('completed', 50), ('pending', 20), ('accepted', 15), ('rejected', 10), ('cancelled', 5)]
+
+# Messages per conversation thread, on average
+MESSAGES_PER_THREAD = 25
+
+LOCATIONS = ['London', 'Paris', 'Berlin', 'Mumbai', 'Tokyo', 'New York', 'Toronto', 'Sydney', 'Lagos', 'São Paulo']
+FIRST_NAMES = ['Alex', 'Sam', 'Priya', 'Chen', 'Maria', 'Omar', 'Yuki', 'Lena', 'Diego', 'Amara']
+LAST_NAMES = ['Smith', 'Patel', 'Wang', 'Garcia', 'Khan', 'Sato', 'Müller', 'Okafor', 'Silva', 'Brown']
+PHRASES = [
+    'Hi! Are you free this week for a session?',
+    'Thanks, that was really helpful.',
+    'Could we move our swap to Saturday morning?',
+    'I have uploaded the notes we talked about.',
+    'Sounds good, see you then!',
+    'What level would you say you are at right now?',
+]
+FEEDBACK = ['Great teacher, very patient.', 'Well prepared and friendly.', 'Helpful session.', '', 'Would swap again!']
+
+
+def scaled_volumes(scale=1.0, **overrides):
+    volumes = {name: max(1, int(count * scale)) for name, count in VOLUMES.items()}
+    volumes.update({name: count for name, count in overrides.items() if count is not None})
+    return volumes
+
+
+def batches(total, batch_size):
+    """Sizes of consecutive batches adding up to `total`"""
+    while total > 0:
+        size = min(batch_size, total)
+        yield size
+        total -= size
+
+
+def bench_users():
+    return User.objects.filter(username__startswith=USERNAME_PREFIX)
+
+
+def create_users(count, skills_per_user, batch_size, rng, stdout=None):
+    """
+    Users with profiles and skills; returns the new user ids.
+
+    Each user offers and wants skills_per_user / 2 distinct approved skills.
+    """
+    skills = list(Skill.objects.filter(is_approved=True).values_list('id', 'name'))
+    per_type = min(len(skills), max(1, skills_per_user // 2))
+    # Hashing is deliberately slow, so every user shares one hash
+    password = make_password(PASSWORD)
+    start = bench_users().count()
+    user_ids = []
+    for size in batches(count, batch_size):
+        usernames = [f'{USERNAME_PREFIX}{start + len(user_ids) + i + 1:07d}' for i in range(size)]
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=username, password=password, email=f'{username}@example.com',
+                     first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES))
+                for username in usernames
+            ])
+            # MySQL does not return ids from bulk inserts
+            ids = list(User.objects.filter(username__in=usernames).order_by('id').values_list('id', flat=True))
+            profiles = []
+            user_skills = []
+            for user_id in ids:
+                summary = {'offered': [], 'wanted': []}
+                for skill_type in ('offered', 'wanted'):
+                    for skill_id, name in rng.sample(skills, per_type):
+                        level = rng.choice(['beginner', 'intermediate', 'expert'])
+                        summary[skill_type].append({'id': skill_id, 'name': name, 'level': level})
+                        user_skills.append(UserSkill(user_id=user_id, skill_id=skill_id, skill_type=skill_type, level=level))
+                profiles.append(UserProfile(
+                    user_id=user_id,
+                    location=rng.choice(LOCATIONS),
+                    bio=f'{rng.choice(FIRST_NAMES)} likes learning new things.',
+                    availability=rng.choice(['weekdays', 'weekends', 'evenings', 'flexible']),
+                    visibility='public' if rng.random() < 0.9 else 'private',
+                    skill_summary=summary,
+                ))
+            UserProfile.objects.bulk_create(profiles)
+            UserSkill.objects.bulk_create(user_skills)
+        user_ids.extend(ids)
+        if stdout is not None:
+            stdout.write(f'Created {len(user_ids):,} users...')
+    return user_ids
+
+
+def create_swaps(user_ids, count, batch_size, rng, stdout=None):
+    skill_ids = list(Skill.objects.filter(is_approved=True).values_list('id', flat=True))
+    statuses = [status for status, _ in SWAP_STATUSES]
+    weights = [weight for _, weight in SWAP_STATUSES]
+    created = 0
+    for size in batches(count, batch_size):
+        swaps = []
+        for _ in range(size):
+            requester_id, receiver_id = rng.sample(user_ids, 2)
+            swaps.append(SwapRequest(
+                requester_id=requester_id,
+                receiver_id=receiver_id,
+                skill_offered_id=rng.choice(skill_ids),
+                skill_wanted_id=rng.choice(skill_ids),
+                message=rng.choice(PHRASES),
+                status=rng.choices(statuses, weights)[0],
+            ))
+        SwapRequest.objects.bulk_create(swaps)
+        created += size
+        if stdout is not None:
+            stdout.write(f'Created {created:,} swap requests...')
+    return created
+
+
+def create_ledger_and_ratings(ratings, batch_size, rng, stdout=None):
+    """
+    Points ledger rows for every generated completed swap that has none yet,
+    and up to `ratings` ratings spread over them; returns (ledger rows, ratings).
+    """
+    completed = SwapRequest.objects.filter(
+        status='completed', requester__in=bench_users(), points_transactions__isnull=True
+    )
+    total = completed.count()
+    # Each completed swap can be rated by both sides
+    chance = min(1.0, ratings / (2 * total)) if total else 0
+    ledger_rows = rated = 0
+    last_pk = 0
+    while True:
+        chunk = list(
+            completed.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'requester_id', 'receiver_id')[:batch_size]
+        )
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        ledger = []
+        reviews = []
+        for swap_id, requester_id, receiver_id in chunk:
+            for user_id in (requester_id, receiver_id):
+                ledger.append(PointsTransaction(user_id=user_id, swap_request_id=swap_id,
+                                                amount=SWAP_COMPLETION_POINTS, reason='swap_completed'))
+            for rater_id, rated_id in ((requester_id, receiver_id), (receiver_id, requester_id)):
+                if rated + len(reviews) < ratings and rng.random() < chance:
+                    reviews.append(Rating(swap_request_id=swap_id, rater_id=rater_id, rated_user_id=rated_id,
+                                          rating=rng.choices([5, 4, 3, 2, 1], [50, 30, 12, 5, 3])[0],
+                                          feedback=rng.choice(FEEDBACK)))
+        with transaction.atomic():
+            PointsTransaction.objects.bulk_create(ledger)
+            Rating.objects.bulk_create(reviews)
+        ledger_rows += len(ledger)
+        rated += len(reviews)
+        if stdout is not None:
+            stdout.write(f'Recorded {last_pk:,} swaps: {ledger_rows:,} ledger rows, {rated:,} ratings...')
+    return ledger_rows, rated
+
+
+def create_messages(user_ids, count, batch_size, rng, stdout=None):
+    """`count` messages spread over count / MESSAGES_PER_THREAD conversation threads"""
+    threads = [tuple(rng.sample(user_ids, 2)) for _ in range(max(1, count // MESSAGES_PER_THREAD))]
+    created = 0
+    for size in batches(count, batch_size):
+        messages = []
+        for _ in range(size):
+            sender_id, receiver_id = rng.choice(threads)
+            if rng.random() < 0.5:
+                sender_id, receiver_id = receiver_id, sender_id
+            messages.append(Message(sender_id=sender_id, receiver_id=receiver_id,
+                                    content=rng.choice(PHRASES), is_read=rng.random() < 0.9))
+        Message.objects.bulk_create(messages)
+        created += size
+        if stdout is not None:
+            stdout.write(f'Created {created:,} messages...')
+    return created
+
+
+def generate(volumes, batch_size=5000, seed=42, stdout=None):
+    """Create every kind of row in `volumes` (see VOLUMES); returns the row counts"""
+    rng = random.Random(seed)
+    skills_per_user = max(2, volumes['user_skills'] // volumes['users'])
+    user_ids = create_users(volumes['users'], skills_per_user, batch_size, rng, stdout)
+    if len(user_ids) < 2:
+        return {'users': len(user_ids)}
+    swaps = create_swaps(user_ids, volumes['swaps'], batch_size, rng, stdout)
+    ledger_rows, ratings = create_ledger_and_ratings(volumes['ratings'], batch_size, rng, stdout)
+    messages = create_messages(user_ids, volumes['messages'], batch_size, rng, stdout)
+    return {
+        'users': len(user_ids),
+        'user_skills': UserSkill.objects.filter(user_id__in=bench_users()).count(),
+        'swaps': swaps,
+        'ledger_rows': ledger_rows,
+        'ratings': ratings,
+        'messages': messages,
+    }
+
+
+def clear(batch_size=1000, stdout=None):
+    """Delete every generated user (their rows cascade) in primary-key batches; returns users deleted"""
+    deleted = 0
+    while True:
+        ids = list(bench_users().order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        User.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        if stdout is not None:
+            stdout.write(f'Deleted {deleted:,} users...')
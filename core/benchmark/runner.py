@@ -0,0 +1,170 @@
+"""
+Per-view latency benchmark.
+
+Every named route in core.urls is requested through the test client as
+one logged-in user. URL arguments are filled from that user's data: a
+public chat partner for usernames, one of their completed swaps (on
+either side, not yet rated by them, so rate_user renders its form) for
+request ids and one of their skills for skill ids. Routes that change
+data on GET, end the session or never finish are skipped and listed in
+the report.
+
+Views that answer with anything but a 2xx are listed under 'not_ok' with
+their statuses: their timings measure a redirect or an error page, not
+the view.
+
+Each view gets `warmup` untimed requests, then `iterations` timed ones
+recorded with core.querybudget.QueryRecorder, then one more request under
+tracemalloc for its peak Python memory. Tracing slows allocation, so it
+is kept out of the timed requests.
+"""
+import logging
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.test import Client
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import percentiles
+from .. import urls
+from ..models import Conversation, SwapRequest, UserSkill
+from ..querybudget import QueryRecorder, budget_for, violations
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SKIPPED = {
+    'logout': 'ends the session',
+    'skill_delete': 'deletes a skill on GET',
+    'handle_swap_request': 'changes swap status on GET',
+    'notifications_stream': 'streams until the client disconnects',
+}
+
+
+def url_arguments(user):
+    """Values for every URL parameter in core.urls, taken from `user`'s own data"""
+    # A public profile, so the profile and review pages render rather than redirect
+    conversation = Conversation.objects.filter(
+        user=user, other_user__userprofile__visibility='public'
+    ).select_related('other_user').order_by('-last_message_at').first()
+    other = conversation.other_user if conversation else user
+    completed = SwapRequest.objects.filter(Q(requester=user) | Q(receiver=user), status='completed').order_by('-id')
+    swap_request = completed.exclude(rating__rater=user).first() or completed.first()
+    user_skill = UserSkill.objects.filter(user=user).order_by('id').first()
+    return {
+        'username': other.username,
+        'request_id': swap_request.pk if swap_request else 0,
+        'skill_id': user_skill.pk if user_skill else 0,
+    }
+
+
+def routes(arguments):
+    """[(url name, path or None, reason skipped)] for every named route in core.urls"""
+    found = []
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        if pattern.name in SKIPPED:
+            found.append((pattern.name, None, SKIPPED[pattern.name]))
+            continue
+        kwargs = {name: arguments[name] for name in pattern.pattern.converters}
+        found.append((pattern.name, reverse(pattern.name, kwargs=kwargs), None))
+    return found
+
+
+def measure(client, name, path, iterations, warmup):
+    for _ in range(warmup):
+        client.get(path)
+    latencies = []
+    queries = []
+    db_times = []
+    statuses = set()
+    for _ in range(iterations):
+        with QueryRecorder() as recorder:
+            start = time.perf_counter()
+            response = client.get(path)
+            latencies.append((time.perf_counter() - start) * 1000)
+        statuses.add(response.status_code)
+        queries.append(recorder.count)
+        db_times.append(recorder.db_time_ms)
+
+    tracemalloc.start()
+    try:
+        client.get(path)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latency = percentiles(latencies)
+    return {
+        'path': path,
+        'status': sorted(statuses),
+        'ok': all(200 <= status < 300 for status in statuses),
+        'latency_ms': {key: round(value, 3) for key, value in latency.items()},
+        'queries': {'min': min(queries), 'max': max(queries)},
+        'db_time_ms': round(percentiles(db_times)['p50'], 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+        # Checked against the last timed request, as the middleware would
+        'over_budget': violations(recorder, budget_for(name)),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(user, iterations=50, warmup=5, only=None, stdout=None):
+    """Benchmark every route as `user`; returns the report as a dict ready for JSON"""
+    client = Client()
+    client.force_login(user)
+    views = {}
+    skipped = {}
+    # Budget overruns go in the report instead of a warning per request
+    budget_logger = logging.getLogger('core.querybudget')
+    budget_logger.disabled = True
+    try:
+        for name, path, reason in routes(url_arguments(user)):
+            if only and name not in only:
+                continue
+            if path is None:
+                skipped[name] = reason
+                continue
+            result = measure(client, name, path, iterations, warmup)
+            views[name] = result
+            if stdout is not None:
+                latency = result['latency_ms']
+                stdout.write(
+                    f'{name:24} p50 {latency["p50"]:8.2f} ms   p95 {latency["p95"]:8.2f} ms   '
+                    f'p99 {latency["p99"]:8.2f} ms   {result["queries"]["max"]:3} queries'
+                    + ('' if result['ok'] else f'   ⚠️  status {", ".join(map(str, result["status"]))}')
+                )
+    finally:
+        budget_logger.disabled = False
+    return {
+        'started_at': timezone.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'user': user.username,
+        'iterations': iterations,
+        'warmup': warmup,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+        'views': views,
+        'not_ok': {name: result['status'] for name, result in views.items() if not result['ok']},
+        'skipped': skipped,
+    }
@@ -0,0 +1,117 @@
+"""
+Process-local skill catalog, revalidated against a shared version number.
+
+Skills change rarely (a user creates one, an admin approves or rejects
+some) but are listed on many pages. Each process keeps the whole catalog
+in memory and checks a version number in the shared cache before using
+it: one cache read per lookup, no skill query. Every Skill write bumps the
+version after commit, so the next lookup in every process sharing that
+cache reloads. With a per-process cache (the default LocMemCache) other
+processes, such as run_tasks workers, never see the bump, so a copy is
+also reloaded once it is SKILL_CATALOG_MAX_AGE seconds old.
+
+The catalog holds the approved skills ordered by category and name, the
+same list grouped by category, and an id -> name map covering every skill,
+approved or not, for badges on existing swaps.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Skill
+
+VERSION_KEY = 'skills:catalog:version'
+MAX_AGE = getattr(settings, 'SKILL_CATALOG_MAX_AGE', 60)
+
+CatalogSkill = namedtuple('CatalogSkill', 'id name category description')
+
+
+class Catalog:
+    def __init__(self, version, rows):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.names = {}
+        self.approved = []
+        self.by_category = {}
+        for pk, name, category, description, is_approved in rows:
+            self.names[pk] = name
+            if is_approved:
+                skill = CatalogSkill(pk, name, category, description)
+                self.approved.append(skill)
+                self.by_category.setdefault(category, []).append(skill)
+
+    @classmethod
+    def load(cls, version):
+        rows = Skill.objects.order_by('category', 'name').values_list(
+            'id', 'name', 'category', 'description', 'is_approved'
+        )
+        return cls(version, list(rows))
+
+
+_local = None
+_lock = threading.Lock()
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a cache flush never reuses an old number
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def is_current(catalog, version):
+    return (
+        catalog is not None and catalog.version == version
+        and time.monotonic() - catalog.loaded_at < MAX_AGE
+    )
+
+
+def get_catalog():
+    """This process's catalog, reloaded if the version was bumped or it is older than MAX_AGE"""
+    global _local
+    version = current_version()
+    catalog = _local
+    if not is_current(catalog, version):
+        with _lock:
+            if not is_current(_local, version):
+                _local = Catalog.load(version)
+            catalog = _local
+    return catalog
+
+
+def bump():
+    """Invalidate every process's copy; call after writing Skill rows"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def bump_on_commit():
+    transaction.on_commit(bump)
+
+
+def approved_skills():
+    return get_catalog().approved
+
+
+def skills_by_category():
+    return get_catalog().by_category
+
+
+def skill_name(skill_id):
+    return get_catalog().names.get(skill_id, '')
+
+
+def choices(skill_ids, blank='---------'):
+    """Select choices for the given skill ids, in catalog order"""
+    names = get_catalog().names
+    wanted = set(skill_ids)
+    options = [(pk, name) for pk, name in names.items() if pk in wanted]
+    return [('', blank)] + options
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .sessions import cache_is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_session_cache(app_configs, **kwargs):
+    if settings.SESSION_ENGINE != 'core.sessions' or cache_is_shared():
+        return []
+    alias = settings.SESSION_CACHE_ALIAS
+    return [Warning(
+        f"CACHES['{alias}'] is local to each process, so SESSION_ENGINE 'core.sessions' "
+        "falls back to reading and writing every session in the database.",
+        hint=f"Point CACHES['{alias}'] at a cache shared by all workers (Redis or Memcached).",
+        id='core.W001',
+    )]
@@ -0,0 +1,70 @@
+"""
+WebSocket chat.
+
+A socket at ws/chat/<username>/ joins the thread's group (see
+core.realtime). Clients send
+
+    {"type": "message", "content": "..."}   to post a message
+    {"type": "read", "ids": [1, 2]}         to mark received messages read
+
+and receive {"type": "message", ...} and {"type": "read", ...} frames for
+both participants. Messages are saved through core.conversations, the same
+path the HTTP form uses, so the inbox, unread counts and achievements stay
+in step whichever way a message arrives.
+"""
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.contrib.auth.models import User
+
+from . import conversations, realtime
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+        self.other_user = await database_sync_to_async(
+            User.objects.filter(username=self.scope['url_route']['kwargs']['username']).first
+        )()
+        if self.other_user is None or self.other_user == self.user:
+            await self.close()
+            return
+        self.group = realtime.thread_group(self.user.pk, self.other_user.pk)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content):
+        kind = content.get('type')
+        if kind == 'message':
+            text = str(content.get('content', '')).strip()
+            if text:
+                await database_sync_to_async(conversations.send_message)(self.user, self.other_user, text)
+        elif kind == 'read':
+            ids = [pk for pk in content.get('ids', []) if isinstance(pk, int)]
+            if ids:
+                await database_sync_to_async(conversations.mark_read)(self.user, self.other_user, ids)
+
+    # Group events, see core.realtime
+
+    async def chat_message(self, event):
+        await self.send_json({
+            'type': 'message',
+            'id': event['id'],
+            'mine': event['sender_id'] == self.user.pk,
+            'content': event['content'],
+            'created_at': event['created_at'],
+        })
+
+    async def chat_read(self, event):
+        await self.send_json({
+            'type': 'read',
+            'mine': event['reader_id'] == self.user.pk,
+            'ids': event['ids'],
+        })
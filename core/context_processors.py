@@ -1,8 +1,7 @@
-from .models import Message
+from . import unread
 
 def unread_messages(request):
-    """Add unread message count to all templates"""
+    """Add unread message count to all templates (a cache read, see core.unread)"""
     if request.user.is_authenticated:
-        unread_count = Message.objects.filter(receiver=request.user, is_read=False).count()
-        return {'unread_messages_count': unread_count}
+        return {'unread_messages_count': unread.get(request.user.pk)}
     return {'unread_messages_count': 0}
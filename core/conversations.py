@@ -0,0 +1,190 @@
+"""
+Inbox threads backed by the Conversation table.
+
+Every thread has one Conversation row per participant holding the last
+message (id, time, snippet) and that participant's unread count. Sending
+a message touches both rows with a few single-row UPDATEs and marking a
+thread read decrements the reader's count by the number of messages
+flipped, so the inbox is one indexed, keyset-paginated query however much
+history the user has.
+
+Messages created or deleted anywhere else (the admin, a shell) reach the
+threads through the Message signals in core.signals.
+"""
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+
+from . import notifications, realtime, tasks, unread
+from .models import Conversation, Message
+from .pagination import KeysetPaginator
+
+SNIPPET_LENGTH = 100
+INBOX_PER_PAGE = 20
+CHAT_WINDOW = 30  # messages per chat history page
+
+
+def snippet(content):
+    return ' '.join(content.split())[:SNIPPET_LENGTH]
+
+
+def lower_unread(count):
+    """unread_count less `count`, never below 0"""
+    # Compare before subtracting: on MySQL the column is unsigned and going
+    # below 0 is an error, not a negative number for Greatest() to clamp
+    return Case(
+        When(unread_count__gte=count, then=F('unread_count') - count),
+        default=Value(0),
+        output_field=models.PositiveIntegerField(),
+    )
+
+
+def last_fields(message, user_id):
+    return {
+        'last_message_id': message.pk,
+        'last_message_at': message.created_at,
+        'last_message_snippet': snippet(message.content),
+        'last_sender_is_user': message.sender_id == user_id,
+    }
+
+
+def record_message(message):
+    """Move both participants' threads to a newly saved message"""
+    sender_id, receiver_id = message.sender_id, message.receiver_id
+    # A message saved concurrently but created earlier must not replace a newer one
+    newer = Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.created_at)
+    with transaction.atomic():
+        Conversation.objects.bulk_create(
+            [
+                Conversation(user_id=sender_id, other_user_id=receiver_id),
+                Conversation(user_id=receiver_id, other_user_id=sender_id),
+            ],
+            ignore_conflicts=True,
+        )
+        Conversation.objects.filter(newer, user_id=sender_id, other_user_id=receiver_id).update(
+            **last_fields(message, sender_id)
+        )
+        Conversation.objects.filter(newer, user_id=receiver_id, other_user_id=sender_id).update(
+            **last_fields(message, receiver_id)
+        )
+        if not message.is_read:
+            Conversation.objects.filter(user_id=receiver_id, other_user_id=sender_id).update(
+                unread_count=F('unread_count') + 1
+            )
+            transaction.on_commit(lambda: unread.incr(receiver_id))
+            notifications.unread_changed(receiver_id)
+
+
+def discard_message(message):
+    """Take a deleted message out of both participants' threads"""
+    sender_id, receiver_id = message.sender_id, message.receiver_id
+    with transaction.atomic():
+        if not message.is_read:
+            Conversation.objects.filter(user_id=receiver_id, other_user_id=sender_id).update(
+                unread_count=lower_unread(1)
+            )
+            transaction.on_commit(lambda: unread.decr(receiver_id))
+            notifications.unread_changed(receiver_id)
+        # Threads that showed it had last_message set to NULL by the delete
+        latest = thread_messages(sender_id, receiver_id).order_by('-created_at', '-id').first()
+        for user_id, other_user_id in ((sender_id, receiver_id), (receiver_id, sender_id)):
+            thread = Conversation.objects.filter(user_id=user_id, other_user_id=other_user_id)
+            if latest is None:
+                thread.delete()
+            else:
+                thread.filter(last_message__isnull=True).update(**last_fields(latest, user_id))
+
+
+def send_message(sender, receiver, content):
+    """Save a message, update both threads and push it to connected clients"""
+    with transaction.atomic():
+        # Threads and the unread counter follow through the post_save signal
+        message = Message.objects.create(sender=sender, receiver=receiver, content=content)
+        realtime.publish(realtime.thread_group(sender.pk, receiver.pk), realtime.message_event(message))
+        tasks.record_message.delay(message.pk)
+    return message
+
+
+def mark_read(user, other_user, message_ids=None):
+    """
+    Mark messages from other_user to user as read, only those in
+    message_ids if given; returns how many were unread. The sender is
+    sent a read receipt for them.
+    """
+    pending = Message.objects.filter(sender=other_user, receiver=user, is_read=False)
+    if message_ids is not None:
+        pending = pending.filter(pk__in=message_ids)
+    with transaction.atomic():
+        read_ids = list(pending.select_for_update().values_list('pk', flat=True))
+        if not read_ids:
+            return 0
+        count = Message.objects.filter(pk__in=read_ids, is_read=False).update(is_read=True)
+        Conversation.objects.filter(user=user, other_user=other_user).update(
+            unread_count=lower_unread(count)
+        )
+        realtime.publish(realtime.thread_group(user.pk, other_user.pk), realtime.read_event(user.pk, read_ids))
+        transaction.on_commit(lambda: unread.decr(user.pk, count))
+        notifications.unread_changed(user.pk)
+    return count
+
+
+def inbox_page(user, cursor=None, per_page=INBOX_PER_PAGE):
+    """One page of a user's threads, most recently active first"""
+    conversations = Conversation.objects.filter(user=user).select_related('other_user__userprofile')
+    return KeysetPaginator(conversations, per_page, ordering=('-last_message_at', '-id')).get_page(cursor)
+
+
+def thread_messages(user, other_user):
+    return Message.objects.filter(
+        Q(sender=user, receiver=other_user) |
+        Q(sender=other_user, receiver=user)
+    )
+
+
+def history_page(user, other_user, cursor=None, per_page=CHAT_WINDOW):
+    """
+    A window of the thread between two users. Without a cursor this is the
+    latest per_page messages; page.next_cursor then fetches older ones.
+    The window is returned oldest first, ready to render.
+    """
+    paginator = KeysetPaginator(thread_messages(user, other_user), per_page, ordering=('-created_at', '-id'))
+    page = paginator.get_page(cursor)
+    page.object_list.reverse()
+    return page
+
+
+def mark_window_read(user, other_user, page):
+    """Mark read only the unread messages to `user` within a rendered window"""
+    unread_ids = [message.pk for message in page if message.receiver_id == user.pk and not message.is_read]
+    if not unread_ids:
+        return 0
+    return mark_read(user, other_user, unread_ids)
+
+
+def build_threads(messages):
+    """{(user_id, other_user_id): Conversation} from messages iterated oldest first"""
+    threads = {}
+    for message in messages:
+        for user_id, other_user_id in (
+            (message.sender_id, message.receiver_id),
+            (message.receiver_id, message.sender_id),
+        ):
+            thread = threads.get((user_id, other_user_id))
+            if thread is None:
+                thread = threads[user_id, other_user_id] = Conversation(user_id=user_id, other_user_id=other_user_id)
+            thread.last_message_id = message.pk
+            thread.last_message_at = message.created_at
+            thread.last_message_snippet = snippet(message.content)
+            thread.last_sender_is_user = message.sender_id == user_id
+            if message.receiver_id == user_id and not message.is_read:
+                thread.unread_count += 1
+    return threads
+
+
+def rebuild(batch_size=1000):
+    """Recreate every Conversation row from Message history; returns the row count"""
+    messages = Message.objects.only('sender_id', 'receiver_id', 'content', 'is_read', 'created_at')
+    threads = build_threads(messages.order_by('created_at', 'id').iterator(chunk_size=batch_size))
+    with transaction.atomic():
+        Conversation.objects.all().delete()
+        Conversation.objects.bulk_create(threads.values(), batch_size=batch_size)
+    return len(threads)
@@ -0,0 +1,89 @@
+"""
+Cancelling swap requests nobody followed up on.
+
+A pending or accepted request is stale when
+
+* its scheduled_date passed more than SWAP_REQUEST_SCHEDULE_GRACE_DAYS
+  ago (the grace leaves time to mark a swap that did happen completed), or
+* it has no scheduled_date and has not changed for
+  SWAP_REQUEST_MAX_AGE_DAYS.
+
+expire() walks the table in primary-key order and cancels stale requests
+in chunks of batch_size, one short transaction per chunk: the chunk's
+rows are locked by primary key, re-checked and flipped with one UPDATE,
+so a request accepted or completed meanwhile is left alone and no lock is
+held for longer than one chunk. Both users get a swap_status notification
+once the chunk commits.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import notifications
+from .models import SwapRequest
+
+OPEN_STATUSES = ('pending', 'accepted')
+
+
+def stale(max_age_days=None, grace_days=None, now=None):
+    """Q matching open requests that are stale as of `now`"""
+    now = now or timezone.now()
+    if max_age_days is None:
+        max_age_days = getattr(settings, 'SWAP_REQUEST_MAX_AGE_DAYS', 30)
+    if grace_days is None:
+        grace_days = getattr(settings, 'SWAP_REQUEST_SCHEDULE_GRACE_DAYS', 7)
+    return Q(status__in=OPEN_STATUSES) & (
+        Q(scheduled_date__lt=now - timedelta(days=grace_days)) |
+        Q(scheduled_date__isnull=True, updated_at__lt=now - timedelta(days=max_age_days))
+    )
+
+
+def cancel_chunk(pks, condition, now):
+    """Cancel those of `pks` still matching `condition`; returns [(pk, previous status)]"""
+    with transaction.atomic():
+        rows = list(
+            SwapRequest.objects.select_for_update().filter(condition, pk__in=pks).values_list('pk', 'status')
+        )
+        SwapRequest.objects.filter(pk__in=[pk for pk, _ in rows]).update(status='cancelled', updated_at=now)
+    return rows
+
+
+def notify_cancelled(pks):
+    swap_requests = SwapRequest.objects.filter(pk__in=pks).select_related(
+        'requester', 'receiver', 'skill_offered', 'skill_wanted'
+    )
+    for swap_request in swap_requests:
+        notifications.swap_status_changed(swap_request)
+
+
+def expire(max_age_days=None, grace_days=None, batch_size=500, dry_run=False, stdout=None):
+    """
+    Cancel every stale request; returns a Counter of the statuses they were
+    (or, with dry_run, would be) cancelled from.
+    """
+    now = timezone.now()
+    # Fixed for the whole run, so the cutoffs do not move between chunks
+    condition = stale(max_age_days, grace_days, now)
+    expired = Counter()
+    last_pk = 0
+    while True:
+        # Read without locks; only the rows about to change are locked below
+        chunk = list(
+            SwapRequest.objects.filter(condition, pk__gt=last_pk).order_by('pk').values_list('pk', 'status')[:batch_size]
+        )
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        if dry_run:
+            expired.update(status for _, status in chunk)
+            continue
+        rows = cancel_chunk([pk for pk, _ in chunk], condition, now)
+        expired.update(status for _, status in rows)
+        notify_cancelled([pk for pk, _ in rows])
+        if stdout is not None:
+            stdout.write(f'Cancelled {sum(expired.values())} requests...')
+    return expired
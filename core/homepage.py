@@ -0,0 +1,47 @@
+"""
+Caching for the home page, the most-hit anonymous page.
+
+The site statistics are cached as one dict, and the recent-members and
+platform-update blocks as rendered template fragments ({% cache %} in
+home.html). Each expires after HOME_CACHE_TIMEOUT seconds and is also
+dropped as soon as the data behind it changes (see core.signals), so a
+warm anonymous hit renders without a single query.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from .models import Skill, SwapRequest
+
+TIMEOUT = getattr(settings, 'HOME_CACHE_TIMEOUT', 600)
+
+STATS_KEY = 'home:stats'
+# Fragment names used by the {% cache %} tags in core/home.html
+RECENT_PROFILES_FRAGMENT = 'home_recent_profiles'
+ADMIN_MESSAGES_FRAGMENT = 'home_admin_messages'
+
+
+def stats():
+    """{'total_users', 'total_skills', 'total_swaps'}, from the cache when warm"""
+    cached = cache.get(STATS_KEY)
+    if cached is None:
+        cached = {
+            'total_users': User.objects.count(),
+            'total_skills': Skill.objects.count(),
+            'total_swaps': SwapRequest.objects.filter(status='completed').count(),
+        }
+        cache.set(STATS_KEY, cached, TIMEOUT)
+    return cached
+
+
+def invalidate_stats():
+    cache.delete(STATS_KEY)
+
+
+def invalidate_recent_profiles():
+    cache.delete(make_template_fragment_key(RECENT_PROFILES_FRAGMENT))
+
+
+def invalidate_admin_messages():
+    cache.delete(make_template_fragment_key(ADMIN_MESSAGES_FRAGMENT))
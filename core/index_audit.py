@@ -0,0 +1,126 @@
+"""
+EXPLAIN-based index audit.
+
+Rather than keeping a hand-written copy of every view's querysets, the
+audit requests the real pages through the test client, captures the SQL
+they run and asks the database to EXPLAIN each distinct statement. Plans
+are checked for
+
+* full scans: a table read row by row (SQLite "SCAN t", MySQL access type
+  ALL, PostgreSQL "Seq Scan"), and
+* filesorts: rows sorted after fetching instead of read in index order
+  (SQLite "USE TEMP B-TREE FOR ORDER BY", MySQL "using_filesort",
+  PostgreSQL "Sort").
+
+Statements without a WHERE clause (loading a whole small table on
+purpose, like the skill catalog) are not flagged. Planners pick scans
+for tiny tables, so audit a database with realistic volumes.
+"""
+import json
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+Finding = namedtuple('Finding', 'label sql plan issues')
+
+# Parameter values vary between requests; strip them to group statements
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# Schema introspection, not application queries
+_INTROSPECTION = re.compile(r'sqlite_master|information_schema|pg_catalog', re.IGNORECASE)
+
+
+def fingerprint(sql):
+    return _LITERAL.sub('?', sql)
+
+
+def explain(sql):
+    """(plan text, issues) for one captured statement"""
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = '\n'.join(row[-1] for row in cursor.fetchall())
+            return plan, sqlite_issues(plan)
+        if vendor == 'mysql':
+            cursor.execute(f'EXPLAIN FORMAT=JSON {sql}')
+            plan = json.loads(cursor.fetchone()[0])
+            return json.dumps(plan, indent=2), json_plan_issues(plan, mysql_node_issues)
+        if vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return json.dumps(plan, indent=2), json_plan_issues(plan, postgresql_node_issues)
+        cursor.execute(f'EXPLAIN {sql}')
+        return '\n'.join(' '.join(map(str, row)) for row in cursor.fetchall()), []
+
+
+def sqlite_issues(plan):
+    issues = []
+    # Subqueries SQLite materialises are scanned by design
+    derived = set(re.findall(r'(?:CO-ROUTINE|MATERIALIZE) (\w+)', plan))
+    for line in plan.splitlines():
+        line = line.strip()
+        scan = re.match(r'SCAN (\w+)', line)
+        if scan and 'USING' not in line and 'VIRTUAL TABLE' not in line and scan.group(1) not in derived:
+            issues.append(f'full scan of {scan.group(1)}')
+        elif line.startswith('USE TEMP B-TREE FOR'):
+            issues.append(f'filesort ({line[len("USE TEMP B-TREE FOR "):].lower()})')
+    return issues
+
+
+def mysql_node_issues(node):
+    issues = []
+    if node.get('access_type') == 'ALL':
+        issues.append(f"full scan of {node.get('table_name', '?')}")
+    if node.get('using_filesort'):
+        issues.append('filesort')
+    return issues
+
+
+def postgresql_node_issues(node):
+    issues = []
+    if node.get('Node Type') == 'Seq Scan':
+        issues.append(f"full scan of {node.get('Relation Name', '?')}")
+    if node.get('Node Type') == 'Sort':
+        issues.append('filesort')
+    return issues
+
+
+def json_plan_issues(plan, node_issues):
+    """Walk a JSON plan tree collecting node_issues from every object in it"""
+    issues = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            issues.extend(node_issues(node))
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return issues
+
+
+def capture(client, label, path):
+    """[(label, sql)] for the SELECTs run while requesting `path`"""
+    with CaptureQueriesContext(connection) as queries:
+        client.get(path)
+    return [(label, query['sql']) for query in queries if query['sql'].lstrip().upper().startswith('SELECT')]
+
+
+def audit(client, pages):
+    """Replay (label, path) pages and EXPLAIN each distinct statement; returns [Finding]"""
+    findings = []
+    seen = set()
+    for label, path in pages:
+        for label, sql in capture(client, label, path):
+            key = fingerprint(sql)
+            if key in seen or _INTROSPECTION.search(sql):
+                continue
+            seen.add(key)
+            plan, issues = explain(sql)
+            if ' WHERE ' not in sql.upper():
+                issues = []
+            findings.append(Finding(label, sql, plan, issues))
+    return findings
@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from core import index_audit
+
+
+class Command(BaseCommand):
+    help = (
+        "Request the main pages as a user, EXPLAIN every query they run and flag full scans "
+        "and filesorts. Run against a database with production-like volumes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to browse as (default: first active user)')
+        parser.add_argument('--other', help='Username whose profile and chat are opened (default: another user)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just flagged ones')
+        parser.add_argument('--fail', action='store_true', help='Exit with an error if anything is flagged')
+
+    def pages(self, other):
+        return [
+            ('home', reverse('home')),
+            ('dashboard', reverse('dashboard')),
+            ('browse_users', reverse('browse_users')),
+            ('browse_users (search)', reverse('browse_users') + '?query=python'),
+            ('browse_users (category)', reverse('browse_users') + '?category=Technology'),
+            ('skills_manage', reverse('skills_manage')),
+            ('user_profile', reverse('user_profile', args=[other.username])),
+            ('user_reviews', reverse('user_reviews', args=[other.username])),
+            ('send_swap_request', reverse('send_swap_request', args=[other.username])),
+            ('swap_requests', reverse('swap_requests')),
+            ('messages', reverse('messages')),
+            ('chat_with_user', reverse('chat_with_user', args=[other.username])),
+            ('chat_history', reverse('chat_history', args=[other.username])),
+            ('leaderboard', reverse('leaderboard')),
+            ('leaderboard (week)', reverse('leaderboard') + '?period=week'),
+            ('achievements', reverse('achievements')),
+        ]
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True).order_by('pk')
+        user = users.filter(username=options['user']).first() if options['user'] else users.first()
+        if user is None:
+            raise CommandError('No such user to browse as')
+        others = users.exclude(pk=user.pk)
+        other = others.filter(username=options['other']).first() if options['other'] else others.first()
+        if other is None:
+            raise CommandError('Need a second user to open profiles and chats with')
+
+        client = Client()
+        client.force_login(user)
+        self.stdout.write(f'🔍 Auditing query plans as {user.username} (other user: {other.username})...')
+        # Pages mark messages read and save sessions; undo all of it afterwards
+        with transaction.atomic():
+            findings = index_audit.audit(client, self.pages(other))
+            transaction.set_rollback(True)
+
+        flagged = [finding for finding in findings if finding.issues]
+        for finding in findings:
+            if not finding.issues and not options['verbose_plans']:
+                continue
+            marker = '⚠️ ' if finding.issues else '✔️ '
+            self.stdout.write(f'\n{marker}[{finding.label}] {finding.sql[:300]}')
+            for issue in finding.issues:
+                self.stdout.write(self.style.WARNING(f'   - {issue}'))
+            if options['verbose_plans'] or finding.issues:
+                for line in finding.plan.splitlines():
+                    self.stdout.write(f'     {line}')
+
+        summary = f'{len(findings)} distinct queries explained, {len(flagged)} flagged'
+        if flagged and options['fail']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {summary}'))
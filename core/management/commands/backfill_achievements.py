@@ -0,0 +1,16 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core import awards
+
+
+class Command(BaseCommand):
+    help = 'Recompute achievement counters from history and award any earned achievements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users processed per chunk')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🏆 Backfilling achievement counters...')
+        users, granted = awards.backfill(User.objects.all(), batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'✅ Processed {users} users, awarded {granted} achievements'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Render the avatar, card and full sizes of existing profile photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=10, help='Photos per worker task')
+        parser.add_argument('--force', action='store_true', help='Re-render photos that already have sizes')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🖼️  Rendering profile photo sizes...')
+        rendered, failed = thumbnails.backfill(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            force=options['force'],
+            stdout=self.stdout,
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f'⚠️  {failed} photos could not be read'))
+        self.stdout.write(self.style.SUCCESS(f'✅ Rendered {rendered} photos'))
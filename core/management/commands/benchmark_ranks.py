@@ -0,0 +1,70 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import ranking
+from core.benchmark import percentiles
+from core.models import LeaderboardNode
+
+
+class Command(BaseCommand):
+    help = 'Measure leaderboard rank lookup latency against a synthetic population'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=1_000_000, help='Synthetic profiles to rank')
+        parser.add_argument('--lookups', type=int, default=1000, help='Rank lookups to time')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        profiles = options['profiles']
+        lookups = options['lookups']
+
+        # Swaps award 10 points each; most users complete a handful
+        self.stdout.write(f'🎲 Generating points for {profiles:,} synthetic profiles...')
+        histogram = {}
+        for _ in range(profiles):
+            points = 10 * int(rng.expovariate(1 / 15))
+            histogram[points] = histogram.get(points, 0) + 1
+        tree = ranking.FenwickTree.from_histogram(histogram)
+        probes = [10 * int(rng.expovariate(1 / 15)) for _ in range(lookups)]
+
+        # Sanity check against a brute-force count on a few probes
+        for points in probes[:20]:
+            expected = 1 + sum(n for p, n in histogram.items() if p > points)
+            assert tree.rank(points) == expected, (points, tree.rank(points), expected)
+
+        memory_ms = []
+        for points in probes:
+            start = time.perf_counter()
+            tree.rank(points)
+            memory_ms.append((time.perf_counter() - start) * 1000)
+
+        # Load the synthetic tree into the real table inside a transaction
+        # that is rolled back, so the live leaderboard is left untouched
+        database_ms = []
+        with transaction.atomic():
+            LeaderboardNode.objects.all().delete()
+            LeaderboardNode.objects.bulk_create(
+                [LeaderboardNode(index=i, count=c) for i, c in tree.nodes.items() if c], batch_size=1000
+            )
+            for points in probes:
+                start = time.perf_counter()
+                rank = ranking.rank_for_points(points)
+                database_ms.append((time.perf_counter() - start) * 1000)
+                assert rank == tree.rank(points)
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'\n🏆 Rank lookup latency over {lookups:,} lookups, {profiles:,} profiles '
+            f'({len(histogram):,} distinct scores, {len(tree.nodes):,} tree nodes, '
+            f'≤{ranking.CAPACITY.bit_length() - 1} nodes read per lookup)'
+        )
+        for label, samples in (('in-memory tree', memory_ms), ('database tree', database_ms)):
+            stats = percentiles(samples)
+            self.stdout.write(
+                f'   {label:15} p50 {stats["p50"]:.3f} ms   p95 {stats["p95"]:.3f} ms   '
+                f'p99 {stats["p99"]:.3f} ms   mean {stats["mean"]:.3f} ms'
+            )
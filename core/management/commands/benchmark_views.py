@@ -0,0 +1,38 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import data, runner
+
+
+class Command(BaseCommand):
+    help = 'Time every page in core.urls through the test client and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to log in as (default: the first generated benchmark user)')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per view')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per view first')
+        parser.add_argument('--view', action='append', dest='views', help='Only this URL name (repeatable)')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = data.bench_users().order_by('pk').first()
+        if user is None:
+            raise CommandError('No such user; run generate_benchmark_data or pass --user')
+
+        progress = self.stderr if not options['output'] else self.stdout
+        progress.write(f'⏱️  Benchmarking views as {user.username} ({options["iterations"]} requests each)...')
+        report = runner.run(user, iterations=options['iterations'], warmup=options['warmup'],
+                            only=options['views'], stdout=progress)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f'✅ Report for {len(report["views"])} views written to {options["output"]}'))
+        else:
+            self.stdout.write(output)
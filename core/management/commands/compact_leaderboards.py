@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core import points, rollups
+
+
+class Command(BaseCommand):
+    help = 'Delete leaderboard rollups for expired weekly/monthly windows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retain-weeks', type=int, default=rollups.RETAIN_WEEKS)
+        parser.add_argument('--retain-months', type=int, default=rollups.RETAIN_MONTHS)
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be deleted')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recreate all rollups from completed swaps before compacting')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rows = rollups.rebuild(points=points.SWAP_COMPLETION_POINTS)
+            self.stdout.write(f'🔄 Rebuilt {rows} rollups from completed swaps')
+        deleted = rollups.compact(
+            retain_weeks=options['retain_weeks'],
+            retain_months=options['retain_months'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'✅ {verb} {deleted} expired rollups'))
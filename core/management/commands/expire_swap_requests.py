@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core import expiry
+
+
+class Command(BaseCommand):
+    help = 'Cancel pending and accepted swap requests that are past their scheduled date or too old'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=None,
+                            help='Unscheduled requests unchanged this long are stale (default: SWAP_REQUEST_MAX_AGE_DAYS)')
+        parser.add_argument('--grace-days', type=int, default=None,
+                            help='Days after scheduled_date before a request is stale '
+                                 '(default: SWAP_REQUEST_SCHEDULE_GRACE_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Requests cancelled per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the requests that would be cancelled')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🧹 Looking for stale swap requests...')
+        expired = expiry.expire(
+            max_age_days=options['max_age_days'],
+            grace_days=options['grace_days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            stdout=self.stdout,
+        )
+        for status in expiry.OPEN_STATUSES:
+            self.stdout.write(f'  {status}: {expired[status]}')
+        verb = 'would be cancelled' if options['dry_run'] else 'cancelled'
+        self.stdout.write(self.style.SUCCESS(f'✅ {sum(expired.values())} swap requests {verb}'))
@@ -0,0 +1,59 @@
+import io
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.benchmark import data
+
+# Derived tables, rebuilt in dependency order after the bulk inserts
+DERIVED = [
+    ('rebuild_conversations', {}),
+    ('reconcile_unread', {}),
+    ('rebuild_rating_aggregates', {}),
+    ('reconcile_points', {}),
+    ('rebuild_leaderboard', {}),
+    ('compact_leaderboards', {'rebuild': True}),
+    ('rebuild_search_index', {}),
+    ('rebuild_matches', {}),
+    ('backfill_achievements', {}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Create synthetic users, skills, swaps, ratings and messages for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiply the production-scale default volumes (e.g. 0.01 for a quick run)')
+        for name, count in data.VOLUMES.items():
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int, dest=name, default=None,
+                                help=f'Rows to create (default {count:,} x scale)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated users first')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Do not rebuild inbox threads, aggregates, search, matches and leaderboards')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['clear']:
+            self.stdout.write('🧹 Deleting previously generated users...')
+            deleted = data.clear(stdout=self.stdout)
+            self.stdout.write(f'   Deleted {deleted:,} users')
+
+        volumes = data.scaled_volumes(options['scale'], **{name: options[name] for name in data.VOLUMES})
+        self.stdout.write('🎲 Generating ' + ', '.join(f'{count:,} {name}' for name, count in volumes.items()) + '...')
+        created = data.generate(volumes, batch_size=options['batch_size'], seed=options['seed'], stdout=self.stdout)
+
+        if not options['skip_derived']:
+            for command, command_options in DERIVED:
+                # Per-row progress is noise at this scale; keep each command's summary line
+                output = io.StringIO()
+                call_command(command, stdout=output, **command_options)
+                self.stdout.write(f'🔄 {command}: {output.getvalue().strip().splitlines()[-1]}')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            '✅ Created ' + ', '.join(f'{count:,} {name}' for name, count in created.items()) + f' in {elapsed:.0f}s'
+        ))
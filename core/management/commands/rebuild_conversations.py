@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import conversations
+
+
+class Command(BaseCommand):
+    help = 'Recreate inbox threads (last message and unread counts) from message history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Messages read and rows written per batch')
+
+    def handle(self, *args, **options):
+        self.stdout.write('💬 Rebuilding conversations...')
+        threads = conversations.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {threads} conversation rows'))
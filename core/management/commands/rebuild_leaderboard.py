@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import ranking
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the leaderboard rank tree from current profile points'
+
+    def handle(self, *args, **options):
+        nodes = ranking.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✅ Leaderboard rebuilt ({nodes} tree nodes)'))
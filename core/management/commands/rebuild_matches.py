@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core import matching
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored reciprocal skill matches for every user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+        parser.add_argument('--shard-size', type=int, default=1000, help='Users scored per worker task')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Rebuilding skill matches...')
+        total = matching.rebuild_all_matches(
+            workers=options['workers'],
+            shard_size=options['shard_size'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Stored {total} matches'))
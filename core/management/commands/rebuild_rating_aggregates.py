@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import reviews
+
+
+class Command(BaseCommand):
+    help = 'Recompute profile rating counts, sums and star histograms from the Rating table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Profiles checked per batch')
+
+    def handle(self, *args, **options):
+        corrected = reviews.rebuild(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'✅ {corrected} profiles corrected'))
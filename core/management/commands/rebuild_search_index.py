@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents for every user profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Profiles indexed per batch')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'🔎 Rebuilding search index ({search.get_backend().name} backend)...')
+        total = search.rebuild_index(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'✅ Indexed {total} profiles'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import points
+
+
+class Command(BaseCommand):
+    help = 'Reset cached profile point balances to the sum of the points ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Profiles checked per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Only report balances that differ')
+
+    def handle(self, *args, **options):
+        corrected = points.reconcile(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            stdout=self.stdout,
+        )
+        verb = 'would be corrected' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(f'✅ {corrected} balances {verb}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import unread
+
+
+class Command(BaseCommand):
+    help = 'Recount unread messages per conversation and refresh the cached unread counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users reconciled per batch')
+
+    def handle(self, *args, **options):
+        corrected = unread.reconcile(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'✅ {corrected} conversations corrected'))
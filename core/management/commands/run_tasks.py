@@ -0,0 +1,44 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from core import taskqueue
+
+
+class Command(BaseCommand):
+    help = 'Run queued tasks (achievements, leaderboards, matches, photo sizes) on a worker pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Tasks run at once (default: 4)')
+        parser.add_argument('--processes', action='store_true', help='Use worker processes instead of threads')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is ready instead of polling')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between polls when idle')
+        parser.add_argument('--retry-failed', action='store_true', help='Queue failed tasks again before starting')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(f'🔁 Queued {taskqueue.retry_failed()} failed tasks again')
+
+        stop = threading.Event()
+
+        def shut_down(signum, frame):
+            # Running tasks finish; nothing new is claimed
+            self.stdout.write('⏹️  Stopping after running tasks finish...')
+            stop.set()
+
+        signal.signal(signal.SIGINT, shut_down)
+        signal.signal(signal.SIGTERM, shut_down)
+
+        pool = 'processes' if options['processes'] else 'threads'
+        self.stdout.write(f'⚙️  Running tasks on {options["workers"]} {pool} as {taskqueue.worker_name()}...')
+        succeeded, failed = taskqueue.work(
+            workers=options['workers'],
+            processes=options['processes'],
+            once=options['once'],
+            poll_interval=options['poll_interval'],
+            stop=stop,
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f'⚠️  {failed} tasks failed (retried later or marked failed)'))
+        self.stdout.write(self.style.SUCCESS(f'✅ Ran {succeeded} tasks'))
@@ -0,0 +1,314 @@
+"""
+Reciprocal skill-swap matching.
+
+A match is a pair of users where each offers at least one skill the other
+wants. The population is loaded into a SkillIndex of integer bitsets:
+
+* per skill, a bitset over user positions of who offers it and who wants it
+* per user, a bitset over skill ids of what they offer and what they want
+
+Finding everyone who teaches something I want AND wants something I offer
+is then a handful of OR/AND operations over whole-population bitsets,
+after which only the (usually small) set of reciprocal candidates is
+scored on level fit, rating and recency.
+
+Scores are persisted in SkillMatch and kept current incrementally by
+refresh_user_matches() whenever a user's skills, visibility or average
+rating change; rebuild_all_matches() recomputes the whole table across
+CPU cores.
+"""
+import math
+import os
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .workers import pool as worker_pool
+from .models import UserProfile, UserSkill, SkillMatch
+
+LEVEL_RANK = {'beginner': 0, 'intermediate': 1, 'expert': 2}
+
+# Score weights; they add up to 1 and the final score is scaled to 0-100
+SKILL_WEIGHT = 0.40
+LEVEL_WEIGHT = 0.25
+RATING_WEIGHT = 0.20
+RECENCY_WEIGHT = 0.15
+
+SKILL_PAIRS_FOR_FULL_SCORE = 3
+UNRATED_SCORE = 0.6
+RECENCY_HALF_LIFE_DAYS = 30
+
+Match = namedtuple('Match', ['user_id', 'score', 'teaches', 'learns'])
+Match.__doc__ = """A reciprocal match: `teaches` are skill ids they can teach me, `learns` skill ids I can teach them"""
+
+
+def _bits_to_ids(bits):
+    ids = []
+    while bits:
+        low = bits & -bits
+        ids.append(low.bit_length() - 1)
+        bits ^= low
+    return ids
+
+
+class SkillProfile:
+    """One user's offered/wanted skills as bitsets over skill ids, plus levels"""
+    __slots__ = ('offered_bits', 'wanted_bits', 'offered_levels', 'wanted_levels')
+
+    def __init__(self):
+        self.offered_bits = 0
+        self.wanted_bits = 0
+        self.offered_levels = {}
+        self.wanted_levels = {}
+
+    def add(self, skill_id, skill_type, level):
+        if skill_type == 'offered':
+            self.offered_bits |= 1 << skill_id
+            self.offered_levels[skill_id] = LEVEL_RANK.get(level, 0)
+        else:
+            self.wanted_bits |= 1 << skill_id
+            self.wanted_levels[skill_id] = LEVEL_RANK.get(level, 0)
+
+    @classmethod
+    def for_user(cls, user_id):
+        profile = cls()
+        for skill_id, skill_type, level in UserSkill.objects.filter(user_id=user_id).values_list(
+            'skill_id', 'skill_type', 'level'
+        ):
+            profile.add(skill_id, skill_type, level)
+        return profile
+
+
+class SkillIndex:
+    """Snapshot of every matchable (public, not banned) user's skills"""
+
+    def __init__(self):
+        self.user_ids = []
+        self.positions = {}
+        self.profiles = []
+        self.updated_at = []
+        self.offered_by = {}
+        self.wanted_by = {}
+
+    def _position(self, user_id, updated_at):
+        position = self.positions.get(user_id)
+        if position is None:
+            position = len(self.user_ids)
+            self.positions[user_id] = position
+            self.user_ids.append(user_id)
+            self.profiles.append(SkillProfile())
+            self.updated_at.append(updated_at)
+        return position
+
+    def add(self, user_id, skill_id, skill_type, level, updated_at=None):
+        position = self._position(user_id, updated_at)
+        self.profiles[position].add(skill_id, skill_type, level)
+        by_skill = self.offered_by if skill_type == 'offered' else self.wanted_by
+        by_skill[skill_id] = by_skill.get(skill_id, 0) | (1 << position)
+
+    @classmethod
+    def build(cls, user_ids=None):
+        index = cls()
+        rows = UserSkill.objects.filter(
+            user__userprofile__visibility='public',
+            user__userprofile__is_banned=False,
+        )
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        rows = rows.order_by('user_id').values_list(
+            'user_id', 'skill_id', 'skill_type', 'level', 'user__userprofile__updated_at'
+        )
+        for user_id, skill_id, skill_type, level, updated_at in rows.iterator(chunk_size=5000):
+            index.add(user_id, skill_id, skill_type, level, updated_at)
+        return index
+
+    def reciprocal_candidates(self, me):
+        """Positions of users who offer any skill `me` wants and want any skill `me` offers"""
+        teachers = 0
+        for skill_id in _bits_to_ids(me.wanted_bits):
+            teachers |= self.offered_by.get(skill_id, 0)
+        learners = 0
+        for skill_id in _bits_to_ids(me.offered_bits):
+            learners |= self.wanted_by.get(skill_id, 0)
+        return _bits_to_ids(teachers & learners)
+
+
+def level_fit(teacher_levels, learner_levels, skill_ids):
+    """0-1: 1 when an expert teaches a beginner, 0.5 for equal levels"""
+    if not skill_ids:
+        return 0.0
+    total = sum((teacher_levels[s] - learner_levels[s] + 2) / 4 for s in skill_ids)
+    return total / len(skill_ids)
+
+
+def recency(updated_at, now):
+    if updated_at is None:
+        return 0.0
+    age_days = max((now - updated_at).total_seconds(), 0) / 86400
+    return math.pow(0.5, age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def score_pair(me, other, average_rating=None, updated_at=None, now=None):
+    """Score `other` as a swap partner for `me`; returns a Match without user_id, or None"""
+    teaches = _bits_to_ids(other.offered_bits & me.wanted_bits)
+    learns = _bits_to_ids(other.wanted_bits & me.offered_bits)
+    if not teaches or not learns:
+        return None
+    pairs = min(len(teaches), len(learns))
+    fit = (
+        level_fit(other.offered_levels, me.wanted_levels, teaches) +
+        level_fit(me.offered_levels, other.wanted_levels, learns)
+    ) / 2
+    rating = average_rating / 5 if average_rating else UNRATED_SCORE
+    score = (
+        SKILL_WEIGHT * min(1.0, pairs / SKILL_PAIRS_FOR_FULL_SCORE) +
+        LEVEL_WEIGHT * fit +
+        RATING_WEIGHT * rating +
+        RECENCY_WEIGHT * recency(updated_at, now or timezone.now())
+    )
+    return Match(None, round(score * 100, 2), teaches, learns)
+
+
+def average_ratings(user_ids=None):
+    """{user_id: average rating}; every rated user when user_ids is None"""
+    profiles = UserProfile.objects.filter(rating_count__gt=0)
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    return {
+        user_id: rating_sum / rating_count
+        for user_id, rating_sum, rating_count in profiles.values_list('user_id', 'rating_sum', 'rating_count')
+    }
+
+
+def is_matchable(profile):
+    return profile.visibility == 'public' and not profile.is_banned
+
+
+def remove_user_matches(user_ids):
+    """Drop every stored match involving any of `user_ids` (e.g. on ban)"""
+    SkillMatch.objects.filter(Q(user_id__in=user_ids) | Q(matched_user_id__in=user_ids)).delete()
+
+
+def refresh_user_matches(user_id):
+    """
+    Recompute the stored matches involving one user, in both directions.
+
+    Candidates come from two indexed UserSkill lookups (who offers what the
+    user wants, restricted to who wants what they offer), so the cost
+    depends on the user's skills rather than on the population size.
+    """
+    profile = UserProfile.objects.filter(user_id=user_id).first()
+    with transaction.atomic():
+        remove_user_matches([user_id])
+        if profile is None or not is_matchable(profile):
+            return 0
+
+        me = SkillProfile.for_user(user_id)
+        teachers = UserSkill.objects.filter(
+            skill_id__in=_bits_to_ids(me.wanted_bits), skill_type='offered'
+        ).values('user_id')
+        candidate_ids = UserSkill.objects.filter(
+            skill_id__in=_bits_to_ids(me.offered_bits), skill_type='wanted', user_id__in=teachers
+        ).exclude(user_id=user_id).values_list('user_id', flat=True).distinct()
+        index = SkillIndex.build(user_ids=list(candidate_ids))
+        if not index.user_ids:
+            return 0
+
+        ratings = average_ratings(index.user_ids + [user_id])
+        now = timezone.now()
+        rows = []
+        for position, other_id in enumerate(index.user_ids):
+            other = index.profiles[position]
+            mine = score_pair(me, other, ratings.get(other_id), index.updated_at[position], now)
+            theirs = score_pair(other, me, ratings.get(user_id), profile.updated_at, now)
+            if mine is None or theirs is None:
+                continue
+            rows.append(SkillMatch(user_id=user_id, matched_user_id=other_id,
+                                   score=mine.score, teaches=mine.teaches, learns=mine.learns))
+            rows.append(SkillMatch(user_id=other_id, matched_user_id=user_id,
+                                   score=theirs.score, teaches=theirs.teaches, learns=theirs.learns))
+        SkillMatch.objects.bulk_create(rows, batch_size=500)
+        return len(rows) // 2
+
+
+# State of a rebuild worker process, set once per process by _init_rebuild
+_rebuild_state = {}
+
+
+def _init_rebuild(index, ratings, now):
+    _rebuild_state.update(index=index, ratings=ratings, now=now)
+
+
+def _score_shard(positions):
+    index = _rebuild_state['index']
+    ratings = _rebuild_state['ratings']
+    now = _rebuild_state['now']
+    rows = []
+    for position in positions:
+        user_id = index.user_ids[position]
+        me = index.profiles[position]
+        for other_position in index.reciprocal_candidates(me):
+            if other_position == position:
+                continue
+            other_id = index.user_ids[other_position]
+            match = score_pair(me, index.profiles[other_position], ratings.get(other_id),
+                               index.updated_at[other_position], now)
+            if match is not None:
+                rows.append((user_id, other_id, match.score, match.teaches, match.learns))
+    return rows
+
+
+def rebuild_all_matches(workers=None, shard_size=1000, batch_size=1000, stdout=None):
+    """
+    Recompute the whole SkillMatch table.
+
+    The population index is built once in this process; users are then split
+    into shards that worker processes score in parallel. Workers never touch
+    the database; all rows are written back here in batches.
+    """
+    index = SkillIndex.build()
+    shards = [
+        range(start, min(start + shard_size, len(index.user_ids)))
+        for start in range(0, len(index.user_ids), shard_size)
+    ]
+
+    total = 0
+    with worker_pool(
+        workers or os.cpu_count(), 'core.matching._init_rebuild', (index, average_ratings(), timezone.now())
+    ) as pool:
+        results = pool.imap_unordered(_score_shard, shards)
+        with transaction.atomic():
+            SkillMatch.objects.all().delete()
+            for rows in results:
+                SkillMatch.objects.bulk_create(
+                    [
+                        SkillMatch(user_id=user_id, matched_user_id=other_id,
+                                   score=score, teaches=teaches, learns=learns)
+                        for user_id, other_id, score, teaches, learns in rows
+                    ],
+                    batch_size=batch_size,
+                )
+                total += len(rows)
+                if stdout is not None:
+                    stdout.write(f'Stored {total} matches...')
+    return total
+
+
+def suggested_matches(profile, limit=5):
+    """Stored matches for templates: dicts with the matched User and skill names"""
+    matches = SkillMatch.objects.filter(user_id=profile.user_id).select_related(
+        'matched_user__userprofile'
+    ).order_by('-score')[:limit]
+    my_skills = {s['id']: s['name'] for s in profile.offered_skill_summary}
+    results = []
+    for match in matches:
+        their_skills = {s['id']: s['name'] for s in match.matched_user.userprofile.offered_skill_summary}
+        results.append({
+            'user': match.matched_user,
+            'score': match.score,
+            'teaches': [their_skills.get(s, '') for s in match.teaches],
+            'learns': [my_skills.get(s, '') for s in match.learns],
+        })
+    return results
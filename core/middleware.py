@@ -0,0 +1,68 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import staticfiles
+from .querybudget import QueryBudgetExceeded, QueryRecorder, budget_for, report, violations
+
+logger = logging.getLogger('core.querybudget')
+
+
+class QueryBudgetMiddleware:
+    """
+    Record the SQL each request runs and check it against its view's budget
+    (see core.querybudget).
+
+    settings.QUERY_BUDGET_ACTION is 'warn' to log over-budget requests,
+    'raise' to fail them with QueryBudgetExceeded (for development and CI)
+    or None to leave the middleware out. With DEBUG on, responses carry a
+    Server-Timing header so browser dev tools show the query count and
+    database time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.action = getattr(settings, 'QUERY_BUDGET_ACTION', 'warn')
+        if self.action is None:
+            raise MiddlewareNotUsed
+        if self.action not in ('warn', 'raise'):
+            raise ValueError(f"QUERY_BUDGET_ACTION must be 'warn', 'raise' or None, not {self.action!r}")
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        # Streaming bodies query after this returns; only the view's setup was recorded
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        request.query_stats = recorder
+        if settings.DEBUG:
+            response['Server-Timing'] = f'db;dur={recorder.db_time_ms:.1f};desc="{recorder.count} queries"'
+
+        problems = violations(recorder, budget_for(url_name))
+        if problems:
+            message = report(url_name or request.path, recorder, problems)
+            if self.action == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class StaticFilesMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT with immutable caching and
+    precompressed encodings (see core.staticfiles). Put it near the top so
+    static requests skip sessions, auth and the rest.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            response = staticfiles.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+def create_fulltext_index(apps, schema_editor):
+    from core.search import SQLiteFTSBackend, MySQLFulltextBackend
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        MySQLFulltextBackend().create_index(schema_editor)
+    elif vendor == 'sqlite':
+        try:
+            SQLiteFTSBackend().create_index(schema_editor)
+        except OperationalError:
+            # SQLite built without FTS5; core.search falls back to a plain scan
+            pass
+
+
+def drop_fulltext_index(apps, schema_editor):
+    from core.search import SQLiteFTSBackend, MySQLFulltextBackend
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        MySQLFulltextBackend().drop_index(schema_editor)
+    elif vendor == 'sqlite':
+        SQLiteFTSBackend().drop_index(schema_editor)
+
+
+def populate_documents(apps, schema_editor):
+    UserProfile = apps.get_model('core', 'UserProfile')
+    UserSkill = apps.get_model('core', 'UserSkill')
+    ProfileSearchDocument = apps.get_model('core', 'ProfileSearchDocument')
+
+    for profile in UserProfile.objects.select_related('user').iterator():
+        offered, wanted = [], []
+        user_skills = UserSkill.objects.filter(user_id=profile.user_id).values_list(
+            'skill_type', 'skill__name', 'skill__description'
+        )
+        for skill_type, name, description in user_skills:
+            (offered if skill_type == 'offered' else wanted).append(f'{name} {description}'.strip())
+        user = profile.user
+        ProfileSearchDocument.objects.create(
+            profile=profile,
+            name=' '.join(filter(None, [user.username, user.first_name, user.last_name])),
+            location=profile.location or '',
+            bio=profile.bio or '',
+            offered_skills='\n'.join(offered),
+            wanted_skills='\n'.join(wanted),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_userprofile_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileSearchDocument',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='core.userprofile')),
+                ('name', models.TextField(blank=True)),
+                ('location', models.CharField(blank=True, max_length=100)),
+                ('bio', models.TextField(blank=True)),
+                ('offered_skills', models.TextField(blank=True)),
+                ('wanted_skills', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:56
+
+from django.db import migrations, models
+
+
+def populate_skill_summaries(apps, schema_editor):
+    UserProfile = apps.get_model('core', 'UserProfile')
+    UserSkill = apps.get_model('core', 'UserSkill')
+
+    summaries = {}
+    user_skills = UserSkill.objects.order_by('id').values_list('user_id', 'skill_type', 'skill_id', 'skill__name', 'level')
+    for user_id, skill_type, skill_id, name, level in user_skills.iterator():
+        summary = summaries.setdefault(user_id, {'offered': [], 'wanted': []})
+        summary.setdefault(skill_type, []).append({'id': skill_id, 'name': name, 'level': level})
+    for profile in UserProfile.objects.all().iterator():
+        profile.skill_summary = summaries.get(profile.user_id, {'offered': [], 'wanted': []})
+        profile.save(update_fields=['skill_summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_profilesearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='skill_summary',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(populate_skill_summaries, migrations.RunPython.noop),
+    ]
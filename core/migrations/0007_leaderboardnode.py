@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_leaderboard_tree(apps, schema_editor):
+    from core.ranking import FenwickTree
+
+    UserProfile = apps.get_model('core', 'UserProfile')
+    LeaderboardNode = apps.get_model('core', 'LeaderboardNode')
+    histogram = dict(
+        UserProfile.objects.filter(is_banned=False)
+        .values('points')
+        .annotate(profiles=Count('id'))
+        .values_list('points', 'profiles')
+    )
+    tree = FenwickTree.from_histogram(histogram)
+    LeaderboardNode.objects.bulk_create(
+        [LeaderboardNode(index=index, count=count) for index, count in tree.nodes.items() if count],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_skillmatch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardNode',
+            fields=[
+                ('index', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['is_banned', '-points'], name='core_profile_points_idx'),
+        ),
+        migrations.RunPython(build_leaderboard_tree, migrations.RunPython.noop),
+    ]
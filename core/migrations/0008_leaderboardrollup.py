@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_leaderboardnode'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'This Week'), ('month', 'This Month'), ('all', 'All Time')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('category', models.CharField(blank=True, max_length=50)),
+                ('points', models.IntegerField(default=0)),
+                ('swaps', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start', 'category', '-points'], name='core_rollup_board_idx')],
+                'unique_together': {('period', 'period_start', 'category', 'user')},
+            },
+        ),
+    ]
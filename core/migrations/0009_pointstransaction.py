@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    UserProfile = apps.get_model('core', 'UserProfile')
+    PointsTransaction = apps.get_model('core', 'PointsTransaction')
+    PointsTransaction.objects.bulk_create(
+        [
+            PointsTransaction(user_id=user_id, amount=points, reason='opening_balance')
+            for user_id, points in UserProfile.objects.exclude(points=0).values_list('user_id', 'points').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_leaderboardrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField()),
+                ('reason', models.CharField(choices=[('swap_completed', 'Swap Completed'), ('opening_balance', 'Opening Balance'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('swap_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='points_transactions', to='core.swaprequest')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('swap_request', 'user', 'reason')},
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
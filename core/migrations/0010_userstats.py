@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0009_pointstransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('swaps_completed', models.IntegerField(default=0)),
+                ('swaps_taught', models.IntegerField(default=0)),
+                ('swaps_learned', models.IntegerField(default=0)),
+                ('skills_learned', models.IntegerField(default=0)),
+                ('skills_offered', models.IntegerField(default=0)),
+                ('chat_partners', models.IntegerField(default=0)),
+                ('ratings_received', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('positive_ratings', models.IntegerField(default=0)),
+                ('requests_sent', models.IntegerField(default=0)),
+                ('requesters', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
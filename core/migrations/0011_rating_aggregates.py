@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    UserProfile = apps.get_model('core', 'UserProfile')
+    Rating = apps.get_model('core', 'Rating')
+
+    aggregates = {}
+    for user_id, stars in Rating.objects.values_list('rated_user_id', 'rating').iterator():
+        count, total, histogram = aggregates.get(user_id, (0, 0, {}))
+        histogram[str(stars)] = histogram.get(str(stars), 0) + 1
+        aggregates[user_id] = (count + 1, total + stars, histogram)
+    for user_id, (count, total, histogram) in aggregates.items():
+        UserProfile.objects.filter(user_id=user_id).update(
+            rating_count=count, rating_sum=total, rating_histogram=histogram
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_userstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_histogram',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['rated_user', '-created_at', '-id'], name='core_rating_user_recent_idx'),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_conversations(apps, schema_editor):
+    Conversation = apps.get_model('core', 'Conversation')
+    Message = apps.get_model('core', 'Message')
+
+    threads = {}
+    messages = Message.objects.order_by('created_at', 'id').values_list(
+        'id', 'sender_id', 'receiver_id', 'content', 'is_read', 'created_at'
+    )
+    for pk, sender_id, receiver_id, content, is_read, created_at in messages.iterator():
+        for user_id, other_user_id in ((sender_id, receiver_id), (receiver_id, sender_id)):
+            thread = threads.setdefault(
+                (user_id, other_user_id), Conversation(user_id=user_id, other_user_id=other_user_id)
+            )
+            thread.last_message_id = pk
+            thread.last_message_at = created_at
+            thread.last_message_snippet = ' '.join(content.split())[:100]
+            thread.last_sender_is_user = sender_id == user_id
+            if receiver_id == user_id and not is_read:
+                thread.unread_count += 1
+    Conversation.objects.bulk_create(threads.values(), batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('last_message_snippet', models.CharField(blank=True, max_length=100)),
+                ('last_sender_is_user', models.BooleanField(default=False)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.message')),
+                ('other_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-last_message_at', '-id'], name='core_conversation_inbox_idx')],
+                'unique_together': {('user', 'other_user')},
+            },
+        ),
+        migrations.RunPython(populate_conversations, migrations.RunPython.noop),
+    ]
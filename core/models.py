@@ -18,17 +18,82 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     location = models.CharField(max_length=100, blank=True, default='Earth') # Added default location
     profile_photo = models.ImageField(upload_to='profiles/', blank=True)
+    # Set by core.thumbnails once the upload is processed: the original's
+    # size and {'avatar'|'card'|'full': {'width', 'height', 'webp', 'jpeg'}}
+    # storage paths of the pre-rendered sizes
+    photo_width = models.PositiveIntegerField(null=True, blank=True)
+    photo_height = models.PositiveIntegerField(null=True, blank=True)
+    photo_renditions = models.JSONField(default=dict, blank=True)
     bio = models.TextField(max_length=500, blank=True)
     availability = models.CharField(max_length=20, choices=AVAILABILITY_CHOICES, default='flexible')
     visibility = models.CharField(max_length=10, choices=VISIBILITY_CHOICES, default='public')
     points = models.IntegerField(default=0)
     is_verified = models.BooleanField(default=False)
     is_banned = models.BooleanField(default=False)
+    # Denormalized {'offered': [...], 'wanted': [...]} of {'id', 'name', 'level'}
+    # so profile cards render without touching UserSkill/Skill
+    skill_summary = models.JSONField(default=dict, blank=True)
+    # Running totals of received ratings, kept in step by core.reviews;
+    # rating_histogram is {'1'..'5': number of ratings with that many stars}
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_histogram = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Leaderboard top-N: WHERE is_banned = false ORDER BY points DESC
+            models.Index(fields=['is_banned', '-points'], name='core_profile_points_idx'),
+            # Browse and home: WHERE visibility = 'public' AND is_banned = false ORDER BY created_at DESC, id DESC
+            models.Index(fields=['visibility', 'is_banned', '-created_at', '-id'], name='core_profile_browse_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username}'s Profile"
+    
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+    
+    @property
+    def rating_breakdown(self):
+        """[(stars, count, percent)] from 5 stars down, for the profile page"""
+        breakdown = []
+        for stars in range(5, 0, -1):
+            count = self.rating_histogram.get(str(stars), 0)
+            percent = round(100 * count / self.rating_count) if self.rating_count else 0
+            breakdown.append((stars, count, percent))
+        return breakdown
+    
+    @property
+    def offered_skill_summary(self):
+        return self.skill_summary.get('offered', [])
+    
+    @property
+    def wanted_skill_summary(self):
+        return self.skill_summary.get('wanted', [])
+    
+    @property
+    def all_skill_summary(self):
+        return self.offered_skill_summary + self.wanted_skill_summary
+    
+    @classmethod
+    def build_skill_summary(cls, user_id):
+        summary = {'offered': [], 'wanted': []}
+        user_skills = UserSkill.objects.filter(user_id=user_id).order_by('id').values_list(
+            'skill_type', 'skill_id', 'skill__name', 'level'
+        )
+        for skill_type, skill_id, name, level in user_skills:
+            summary.setdefault(skill_type, []).append({'id': skill_id, 'name': name, 'level': level})
+        return summary
+    
+    @classmethod
+    def refresh_skill_summary(cls, user_id):
+        """Recompute the cached skill summary for a user's profile"""
+        cls.objects.filter(user_id=user_id).update(skill_summary=cls.build_skill_summary(user_id))
 
 class Skill(models.Model):
     LEVEL_CHOICES = [
@@ -61,6 +126,10 @@ class UserSkill(models.Model):
     
     class Meta:
         unique_together = ['user', 'skill', 'skill_type']
+        indexes = [
+            # Users offering or wanting a skill (skill summary refresh, matching)
+            models.Index(fields=['skill', 'skill_type'], name='core_userskill_skill_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.skill.name} ({self.skill_type})"
@@ -84,6 +153,13 @@ class SwapRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Incoming and outgoing requests by status (dashboard, swap_requests)
+            models.Index(fields=['receiver', 'status'], name='core_swap_receiver_idx'),
+            models.Index(fields=['requester', 'status'], name='core_swap_requester_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.requester.username} -> {self.receiver.username}: {self.skill_offered.name} for {self.skill_wanted.name}"
 
@@ -97,6 +173,10 @@ class Rating(models.Model):
     
     class Meta:
         unique_together = ['swap_request', 'rater']
+        indexes = [
+            # Review pages: WHERE rated_user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['rated_user', '-created_at', '-id'], name='core_rating_user_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.rater.username} rated {self.rated_user.username}: {self.rating}/5"
@@ -110,6 +190,12 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Chat history windows, scanned in either direction from a (created_at, id) cursor
+            models.Index(fields=['sender', 'receiver', 'created_at', 'id'], name='core_message_thread_idx'),
+            # A user's unread messages: WHERE receiver_id = ? AND is_read = false
+            models.Index(fields=['receiver', 'is_read'], name='core_message_unread_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username} -> {self.receiver.username}: {self.content[:50]}"
@@ -139,3 +225,161 @@ class AdminMessage(models.Model):
     
     def __str__(self):
         return self.title
+
+class ProfileSearchDocument(models.Model):
+    """Flattened copy of a profile and its skills, full-text indexed by core.search"""
+    profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    name = models.TextField(blank=True)
+    location = models.CharField(max_length=100, blank=True)
+    bio = models.TextField(blank=True)
+    offered_skills = models.TextField(blank=True)
+    wanted_skills = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Search document for {self.profile}"
+
+class SkillMatch(models.Model):
+    """Precomputed reciprocal match of `user` with `matched_user`, maintained by core.matching"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='skill_matches')
+    matched_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    teaches = models.JSONField(default=list)  # skill ids matched_user can teach user
+    learns = models.JSONField(default=list)  # skill ids user can teach matched_user
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['user', 'matched_user']
+        indexes = [
+            models.Index(fields=['user', '-score'], name='core_match_user_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} <-> {self.matched_user.username}: {self.score}"
+
+class LeaderboardNode(models.Model):
+    """One node of the Fenwick tree of profile points used by core.ranking"""
+    index = models.PositiveIntegerField(primary_key=True)
+    count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"Node {self.index}: {self.count}"
+
+class LeaderboardRollup(models.Model):
+    """Points earned by a user in one leaderboard window, maintained by core.rollups"""
+    PERIOD_CHOICES = [
+        ('week', 'This Week'),
+        ('month', 'This Month'),
+        ('all', 'All Time'),
+    ]
+    
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    category = models.CharField(max_length=50, blank=True)  # blank = every category
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_rollups')
+    points = models.IntegerField(default=0)
+    swaps = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['period', 'period_start', 'category', 'user']
+        indexes = [
+            models.Index(fields=['period', 'period_start', 'category', '-points'], name='core_rollup_board_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} {self.period} {self.period_start} {self.category or 'all'}: {self.points}"
+
+class PointsTransaction(models.Model):
+    """Append-only points ledger; UserProfile.points is a cached sum of it (see core.points)"""
+    REASON_CHOICES = [
+        ('swap_completed', 'Swap Completed'),
+        ('opening_balance', 'Opening Balance'),
+        ('adjustment', 'Adjustment'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='points_transactions')
+    swap_request = models.ForeignKey(SwapRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name='points_transactions')
+    amount = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        # One award per swap and user, however many times "complete" is clicked
+        unique_together = ['swap_request', 'user', 'reason']
+    
+    def __str__(self):
+        return f"{self.user.username} {self.amount:+d} ({self.reason})"
+
+class UserStats(models.Model):
+    """Per-user activity counters that achievement rules are evaluated against (see core.awards)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    swaps_completed = models.IntegerField(default=0)
+    swaps_taught = models.IntegerField(default=0)  # completed as the receiver, whose skill was asked for
+    swaps_learned = models.IntegerField(default=0)  # completed as the requester
+    skills_learned = models.IntegerField(default=0)  # distinct skills learned through swaps
+    skills_offered = models.IntegerField(default=0)
+    chat_partners = models.IntegerField(default=0)  # distinct users messaged with
+    ratings_received = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    positive_ratings = models.IntegerField(default=0)  # 4 or 5 stars
+    requests_sent = models.IntegerField(default=0)
+    requesters = models.IntegerField(default=0)  # distinct users who sent this user a request
+    
+    def __str__(self):
+        return f"{self.user.username}'s Stats"
+
+class Conversation(models.Model):
+    """
+    One user's view of a chat thread: one row per participant, so the
+    inbox is a single indexed query on (user, last_message_at). Kept up to
+    date by core.conversations as messages are sent and read.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations')
+    other_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_snippet = models.CharField(max_length=100, blank=True)
+    last_sender_is_user = models.BooleanField(default=False)
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['user', 'other_user']
+        indexes = [
+            # Inbox: WHERE user_id = ? ORDER BY last_message_at DESC, id DESC
+            models.Index(fields=['user', '-last_message_at', '-id'], name='core_conversation_inbox_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} <-> {self.other_user.username}"
+
+class Task(models.Model):
+    """
+    Deferred work waiting for a worker (see core.taskqueue). Rows are
+    deleted once their task succeeds; failed ones stay for inspection.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=200)  # dotted path of a @task function
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()  # not before; pushed back after each failure
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            # Claiming: WHERE status = 'queued' AND run_at <= now ORDER BY run_at
+            models.Index(fields=['status', 'run_at'], name='core_task_ready_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.status}, attempt {self.attempts})"
@@ -0,0 +1,83 @@
+"""
+Per-user notification stream served as Server-Sent Events.
+
+Every logged-in user has a channel-layer group; the code paths that send
+messages, mark them read, create swap requests and change their status
+publish small events to it (after commit, see core.realtime). The
+/notifications/stream/ view is async: an idle connection is a coroutine
+waiting on the layer, not a worker thread.
+
+Events sent to the browser:
+
+    unread          {"count": n}
+    swap_request    a new incoming request
+    swap_status     a request the user is part of changed status
+"""
+import asyncio
+import json
+
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from . import realtime, unread
+
+HEARTBEAT_SECONDS = 25  # comment line sent on idle streams so proxies keep them open
+RETRY_MILLISECONDS = 5000
+
+
+def user_group(user_id):
+    return f'user.{user_id}'
+
+
+def notify(user_id, event, data):
+    realtime.publish(user_group(user_id), {'type': 'notify', 'event': event, 'data': data})
+
+
+def unread_changed(user_id):
+    # Read the counter after commit, once the send or mark-read has adjusted it
+    transaction.on_commit(lambda: notify(user_id, 'unread', {'count': unread.get(user_id)}))
+
+
+def swap_payload(swap_request):
+    return {
+        'id': swap_request.pk,
+        'status': swap_request.status,
+        'requester': swap_request.requester.username,
+        'receiver': swap_request.receiver.username,
+        'skill_offered': swap_request.skill_offered.name,
+        'skill_wanted': swap_request.skill_wanted.name,
+    }
+
+
+def swap_requested(swap_request):
+    notify(swap_request.receiver_id, 'swap_request', swap_payload(swap_request))
+
+
+def swap_status_changed(swap_request):
+    payload = swap_payload(swap_request)
+    for user_id in (swap_request.requester_id, swap_request.receiver_id):
+        notify(user_id, 'swap_status', payload)
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def stream(user_id, initial_unread):
+    """Yield SSE frames for one user until the client goes away"""
+    layer = get_channel_layer()
+    channel = await layer.new_channel()
+    group = user_group(user_id)
+    await layer.group_add(group, channel)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        yield format_event('unread', {'count': initial_unread})
+        while True:
+            try:
+                message = await asyncio.wait_for(layer.receive(channel), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(message['event'], message['data'])
+    finally:
+        await layer.group_discard(group, channel)
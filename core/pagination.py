@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination.
+
+django.core.paginator.Paginator needs a COUNT(*) over the whole result set
+and an OFFSET that grows with the page number. KeysetPaginator instead
+remembers the sort key of the last row it returned and asks for rows
+strictly after it, so page 500 costs the same as page 1 as long as the
+ordering is backed by an index.
+
+Cursors are opaque URL-safe tokens; a malformed or tampered cursor simply
+yields the first page.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder truncates to milliseconds, which would break ties
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'v': values, 'd': direction}, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (values, direction); raises ValueError for anything malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        values, direction = payload['v'], payload['d']
+    except (TypeError, KeyError, UnicodeError, json.JSONDecodeError, binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or direction not in (NEXT, PREVIOUS):
+        raise ValueError('Invalid cursor')
+    return values, direction
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None,
+                 approximate_total=None, total_is_capped=False):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.approximate_total = approximate_total
+        self.total_is_capped = total_is_capped
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on a unique ordering, e.g. ('-created_at', '-id').
+
+    The last ordering field must be unique (normally the primary key) so
+    every row has a distinct position. Annotations may be used as keys.
+    If count_cap is set, pages carry an approximate total computed with a
+    COUNT bounded to count_cap + 1 rows.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id'), count_cap=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        self.count_cap = count_cap
+
+    def _after(self, values, reverse):
+        """Filter for rows positioned after `values` (before, if reverse)"""
+        condition = Q()
+        for i, (field, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            term = Q(**{f'{field}__{lookup}': values[i]})
+            for j in range(i):
+                term &= Q(**{self.ordering[j][0]: values[j]})
+            condition |= term
+        return condition
+
+    def _order_by(self, reverse):
+        return [
+            f'-{field}' if descending != reverse else field
+            for field, descending in self.ordering
+        ]
+
+    def _key(self, obj):
+        return [getattr(obj, field) for field, _ in self.ordering]
+
+    def approximate_count(self):
+        """Return (count, capped); the COUNT never scans past count_cap + 1 rows"""
+        count = self.queryset.order_by()[:self.count_cap + 1].count()
+        return min(count, self.count_cap), count > self.count_cap
+
+    def get_page(self, cursor=None):
+        values, direction = None, NEXT
+        if cursor:
+            try:
+                values, direction = decode_cursor(cursor)
+            except ValueError:
+                values, direction = None, NEXT
+            if values is not None and len(values) != len(self.ordering):
+                values, direction = None, NEXT
+
+        queryset = self.queryset
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._after(values, direction == PREVIOUS))
+            except (TypeError, ValueError, ValidationError):
+                values, direction = None, NEXT
+        reverse = direction == PREVIOUS
+        rows = list(queryset.order_by(*self._order_by(reverse))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = encode_cursor(self._key(rows[-1]), NEXT)
+            if values is not None and (has_more or not reverse):
+                previous_cursor = encode_cursor(self._key(rows[0]), PREVIOUS)
+
+        approximate_total, total_is_capped = None, False
+        if self.count_cap:
+            approximate_total, total_is_capped = self.approximate_count()
+        return KeysetPage(rows, next_cursor, previous_cursor, approximate_total, total_is_capped)
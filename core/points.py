@@ -0,0 +1,106 @@
+"""
+Points awarding through the PointsTransaction ledger.
+
+Completing a swap runs one short transaction:
+
+1. a conditional UPDATE flips the swap to 'completed'; if it was already
+   completed (a double click, or both users clicking at once) nothing
+   else happens,
+2. both ledger rows are inserted with one bulk INSERT,
+3. both cached balances move with one UPDATE ... SET points = points + n.
+
+Leaderboard windows and achievements follow on a task worker (see
+core.tasks).
+
+No profile row is read-modified-written, so concurrent completions do not
+lose updates. reconcile() rebuilds the cached balances from the ledger.
+"""
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import homepage, notifications, ranking, tasks
+from .models import PointsTransaction, SwapRequest, UserProfile
+
+SWAP_COMPLETION_POINTS = 10
+
+
+def ensure_profiles(user_ids):
+    existing = set(UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    for user_id in set(user_ids) - existing:
+        UserProfile.objects.get_or_create(user_id=user_id)
+
+
+def award(user_ids, amount, reason, swap_request=None):
+    """Credit `amount` to every user in one ledger insert and one balance update"""
+    with transaction.atomic():
+        PointsTransaction.objects.bulk_create([
+            PointsTransaction(user_id=user_id, swap_request=swap_request, amount=amount, reason=reason)
+            for user_id in user_ids
+        ])
+        UserProfile.objects.filter(user_id__in=user_ids).update(points=F('points') + amount)
+        # The F() update bypasses save() signals, so move the ranks here, all
+        # users in one UPDATE
+        changes = []
+        for balance, is_banned in UserProfile.objects.filter(user_id__in=user_ids).values_list('points', 'is_banned'):
+            if not is_banned:
+                changes += [(balance - amount, -1), (balance, 1)]
+        ranking.apply(changes)
+
+
+def complete_swap(swap_request):
+    """
+    Mark a swap completed and award both users; returns False if it was
+    already completed, in which case nothing is awarded.
+    """
+    user_ids = [swap_request.requester_id, swap_request.receiver_id]
+    ensure_profiles(user_ids)
+    with transaction.atomic():
+        completed = SwapRequest.objects.filter(pk=swap_request.pk).exclude(status='completed').update(
+            status='completed', updated_at=timezone.now()
+        )
+        if not completed:
+            return False
+        award(user_ids, SWAP_COMPLETION_POINTS, 'swap_completed', swap_request=swap_request)
+        tasks.record_swap_completion.delay(swap_request.pk, SWAP_COMPLETION_POINTS, timezone.localdate().isoformat())
+        swap_request.status = 'completed'
+        notifications.swap_status_changed(swap_request)
+        # The completing UPDATE sends no post_save, so drop the cached swap count here
+        transaction.on_commit(homepage.invalidate_stats)
+    return True
+
+
+def reconcile(batch_size=1000, dry_run=False, stdout=None):
+    """
+    Reset every cached balance to its ledger sum, in primary-key batches.
+
+    Returns the number of profiles whose balance was (or, with dry_run,
+    would be) corrected. The rank tree is rebuilt if anything changed.
+    """
+    corrected = 0
+    last_pk = 0
+    while True:
+        profiles = list(
+            UserProfile.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'user_id', 'points')[:batch_size]
+        )
+        if not profiles:
+            break
+        last_pk = profiles[-1][0]
+        ledger = dict(
+            PointsTransaction.objects.filter(user_id__in=[user_id for _, user_id, _ in profiles])
+            .values('user_id')
+            .annotate(total=Sum('amount'))
+            .values_list('user_id', 'total')
+        )
+        wrong = [(pk, ledger.get(user_id, 0), points) for pk, user_id, points in profiles
+                 if ledger.get(user_id, 0) != points]
+        for pk, balance, points in wrong:
+            if stdout is not None:
+                stdout.write(f'Profile {pk}: cached {points}, ledger {balance}')
+            # Conditional on the value we read, so a concurrent award is never overwritten
+            if not dry_run:
+                UserProfile.objects.filter(pk=pk, points=points).update(points=balance)
+        corrected += len(wrong)
+    if corrected and not dry_run:
+        ranking.rebuild()
+    return corrected
@@ -0,0 +1,109 @@
+"""
+Per-view SQL query budgets.
+
+QueryRecorder hooks every database connection with an execute wrapper and
+records each statement's fingerprint and time. Wrappers see the SQL before
+parameters are bound, so a statement run once per row of a loop (an N+1)
+shows up as one fingerprint executed many times.
+
+Budgets come from settings.QUERY_BUDGETS, keyed by URL name, with
+'default' applying to every view not listed:
+
+    QUERY_BUDGETS = {
+        'default': {'queries': 20, 'db_time_ms': 200, 'repeats': 3},
+        'home': {'queries': 6},
+    }
+
+'queries' caps the statement count, 'db_time_ms' the summed database time
+and 'repeats' how often one fingerprint may run. A missing key is not
+checked. core.middleware.QueryBudgetMiddleware applies budgets to live
+requests and core.testing asserts them in tests.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+# IN lists of different lengths are the same statement
+_IN_LIST = re.compile(r'%s(?:, %s)+')
+# Transaction control (BEGIN, savepoints with generated names) is not an application query
+_TRANSACTION_CONTROL = re.compile(
+    r'^\s*(?:BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql):
+    return _IN_LIST.sub('%s, ...', sql)
+
+
+class QueryRecorder:
+    """Context manager counting statements and database time on every connection"""
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            if not _TRANSACTION_CONTROL.match(sql):
+                self.count += 1
+                self.fingerprints[fingerprint(sql)] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def db_time_ms(self):
+        return self.db_time * 1000
+
+    def repeated(self, threshold):
+        """[(fingerprint, times)] run more than `threshold` times, most frequent first"""
+        return [(sql, times) for sql, times in self.fingerprints.most_common() if times > threshold]
+
+
+def budget_for(url_name):
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    budget = dict(budgets.get('default', {}))
+    budget.update(budgets.get(url_name, {}))
+    return budget
+
+
+def violations(recorder, budget):
+    """Human-readable reasons the recorded work is over `budget`"""
+    problems = []
+    limit = budget.get('queries')
+    if limit is not None and recorder.count > limit:
+        problems.append(f'{recorder.count} queries (budget {limit})')
+    limit = budget.get('db_time_ms')
+    if limit is not None and recorder.db_time_ms > limit:
+        problems.append(f'{recorder.db_time_ms:.1f} ms in the database (budget {limit} ms)')
+    limit = budget.get('repeats')
+    if limit is not None:
+        for sql, times in recorder.repeated(limit):
+            problems.append(f'{times}x {sql[:200]}')
+    return problems
+
+
+def report(label, recorder, problems):
+    lines = [f'{label}: {recorder.count} queries, {recorder.db_time_ms:.1f} ms over budget']
+    lines.extend(f'  {problem}' for problem in problems)
+    return '\n'.join(lines)
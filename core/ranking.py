@@ -0,0 +1,137 @@
+"""
+Leaderboard ranks backed by a Fenwick (binary indexed) tree.
+
+The tree counts non-banned profiles per point value and lives in the
+LeaderboardNode table, so every web process shares it. Point values are
+stored in reverse (position = CAPACITY - points) so that a prefix sum
+gives "how many users have more points than p":
+
+    rank(p) = 1 + prefix_sum(position(p) - 1)
+
+A lookup reads at most log2(CAPACITY) nodes in one query, and a batch of
+points changes adjusts at most log2(CAPACITY) nodes per change with one
+UPDATE, however many profiles exist. Deltas are netted per node first:
+a move only touches the nodes where the old and new paths differ, so
+the root and other shared ancestors are left alone, and rows are locked
+in index order, so concurrent updates cannot deadlock. Users with equal
+points share a rank (1, 2, 2, 4).
+"""
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+
+from .models import LeaderboardNode, UserProfile
+
+CAPACITY = 2 ** 24  # highest point value tracked exactly; more is clamped
+
+
+def position(points):
+    return CAPACITY - min(max(points, 0), CAPACITY - 1)
+
+
+def prefix_path(pos):
+    """Node indices summed for the prefix [1, pos]"""
+    path = []
+    while pos > 0:
+        path.append(pos)
+        pos -= pos & -pos
+    return path
+
+
+def update_path(pos):
+    """Node indices that cover `pos`"""
+    path = []
+    while pos <= CAPACITY:
+        path.append(pos)
+        pos += pos & -pos
+    return path
+
+
+class FenwickTree:
+    """Sparse in-memory tree with the same layout as the LeaderboardNode table"""
+
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, points, delta=1):
+        for index in update_path(position(points)):
+            self.nodes[index] = self.nodes.get(index, 0) + delta
+
+    def count_above(self, points):
+        return sum(self.nodes.get(index, 0) for index in prefix_path(position(points) - 1))
+
+    def rank(self, points):
+        return self.count_above(points) + 1
+
+    @classmethod
+    def from_histogram(cls, histogram):
+        """Build from {points: number of profiles}"""
+        tree = cls()
+        for points, count in histogram.items():
+            tree.add(points, count)
+        return tree
+
+
+def rank_for_points(points):
+    """1-based competition rank of a score among non-banned profiles"""
+    above = LeaderboardNode.objects.filter(
+        index__in=prefix_path(position(points) - 1)
+    ).aggregate(total=Sum('count'))['total']
+    return (above or 0) + 1
+
+
+def apply(changes):
+    """Apply (points, delta) profile count changes to the node table in one UPDATE"""
+    deltas = Counter()
+    for points, delta in changes:
+        for index in update_path(position(points)):
+            deltas[index] += delta
+    indices = sorted(index for index, delta in deltas.items() if delta)
+    if not indices:
+        return
+    with transaction.atomic():
+        LeaderboardNode.objects.bulk_create(
+            [LeaderboardNode(index=index) for index in indices], ignore_conflicts=True
+        )
+        LeaderboardNode.objects.filter(index__in=indices).update(count=F('count') + Case(
+            *[When(index=index, then=Value(deltas[index])) for index in indices],
+            default=Value(0),
+            output_field=models.IntegerField(),
+        ))
+
+
+def profile_changed(old_state, new_state):
+    """
+    Apply a profile's (points, is_banned) transition to the tree.
+
+    Either state may be None for a profile that did not exist before or no
+    longer exists.
+    """
+    old_counted = old_state is not None and not old_state[1]
+    new_counted = new_state is not None and not new_state[1]
+    changes = []
+    if old_counted:
+        changes.append((old_state[0], -1))
+    if new_counted:
+        changes.append((new_state[0], 1))
+    apply(changes)
+
+
+def points_histogram():
+    return dict(
+        UserProfile.objects.filter(is_banned=False)
+        .values('points')
+        .annotate(profiles=Count('id'))
+        .values_list('points', 'profiles')
+    )
+
+
+def rebuild(batch_size=1000):
+    """Recreate the node table from the current profile points; returns the node count"""
+    tree = FenwickTree.from_histogram(points_histogram())
+    nodes = [LeaderboardNode(index=index, count=count) for index, count in tree.nodes.items() if count]
+    with transaction.atomic():
+        LeaderboardNode.objects.all().delete()
+        LeaderboardNode.objects.bulk_create(nodes, batch_size=batch_size)
+    return len(nodes)
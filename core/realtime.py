@@ -0,0 +1,40 @@
+"""
+Pushing events to connected clients through the channel layer.
+
+Each chat thread has a group both participants' sockets join. Events are
+sent after the surrounding transaction commits, so a client never sees a
+message that was rolled back. The default in-memory layer only reaches
+sockets served by the same process; point CHANNEL_LAYERS at Redis
+(channels_redis) when running more than one ASGI process.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def thread_group(user_id, other_user_id):
+    low, high = sorted((user_id, other_user_id))
+    return f'chat.{low}.{high}'
+
+
+def publish(group, event):
+    """Send `event` to every socket in `group` once the current transaction commits"""
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    transaction.on_commit(lambda: async_to_sync(layer.group_send)(group, event))
+
+
+def message_event(message):
+    return {
+        'type': 'chat.message',
+        'id': message.pk,
+        'sender_id': message.sender_id,
+        'receiver_id': message.receiver_id,
+        'content': message.content,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def read_event(reader_id, message_ids):
+    return {'type': 'chat.read', 'reader_id': reader_id, 'ids': list(message_ids)}
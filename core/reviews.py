@@ -0,0 +1,92 @@
+"""
+Rating aggregates and paginated reviews.
+
+UserProfile carries rating_count, rating_sum and a per-star histogram, so
+the average and breakdown on a profile are read from one row however many
+reviews a user has. record() and discard() adjust them in the same
+transaction as the Rating insert or delete; the profile row is locked for
+the histogram update and only the rating columns are written, so a
+concurrent points award is never overwritten.
+
+Stored matches score partners on their average rating, so a change
+queues a refresh of the rated user's matches.
+
+Reviews themselves are served a page at a time with keyset pagination.
+"""
+from django.db import transaction
+from django.db.models import Count
+
+from . import tasks
+from .models import Rating, UserProfile
+from .pagination import KeysetPaginator
+
+REVIEWS_PER_PAGE = 5
+
+
+def _adjust(user_id, stars, delta):
+    with transaction.atomic():
+        if delta > 0:
+            UserProfile.objects.get_or_create(user_id=user_id)
+        profile = UserProfile.objects.select_for_update().only(
+            'rating_count', 'rating_sum', 'rating_histogram'
+        ).filter(user_id=user_id).first()
+        if profile is None:
+            return
+        histogram = dict(profile.rating_histogram)
+        histogram[str(stars)] = max(histogram.get(str(stars), 0) + delta, 0)
+        UserProfile.objects.filter(pk=profile.pk).update(
+            rating_count=max(profile.rating_count + delta, 0),
+            rating_sum=max(profile.rating_sum + delta * stars, 0),
+            rating_histogram=histogram,
+        )
+        tasks.refresh_matches.delay(user_id)
+
+
+def record(rating):
+    """Add a newly saved rating to the rated user's aggregates"""
+    _adjust(rating.rated_user_id, rating.rating, 1)
+
+
+def discard(rating):
+    """Remove a deleted rating from the rated user's aggregates"""
+    _adjust(rating.rated_user_id, rating.rating, -1)
+
+
+def review_page(user, cursor=None, per_page=REVIEWS_PER_PAGE):
+    """One page of a user's reviews, newest first"""
+    reviews = Rating.objects.filter(rated_user=user).select_related('rater')
+    return KeysetPaginator(reviews, per_page).get_page(cursor)
+
+
+def rebuild(batch_size=1000, stdout=None):
+    """Recompute every profile's aggregates from Rating in pk batches; returns profiles corrected"""
+    corrected = 0
+    last_pk = 0
+    while True:
+        profiles = list(
+            UserProfile.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'user_id', 'rating_count', 'rating_sum', 'rating_histogram')[:batch_size]
+        )
+        if not profiles:
+            return corrected
+        last_pk = profiles[-1][0]
+        histograms = {}
+        for user_id, stars, count in (
+            Rating.objects.filter(rated_user_id__in=[user_id for _, user_id, *_ in profiles])
+            .values('rated_user_id', 'rating').annotate(n=Count('id'))
+            .values_list('rated_user_id', 'rating', 'n')
+        ):
+            histograms.setdefault(user_id, {})[str(stars)] = count
+        for pk, user_id, count, total, histogram in profiles:
+            expected = histograms.get(user_id, {})
+            expected_count = sum(expected.values())
+            expected_sum = sum(int(stars) * n for stars, n in expected.items())
+            current = {stars: n for stars, n in histogram.items() if n}
+            if (count, total, current) == (expected_count, expected_sum, expected):
+                continue
+            if stdout is not None:
+                stdout.write(f'Profile {pk}: cached {count} ratings / {total} stars, actual {expected_count} / {expected_sum}')
+            UserProfile.objects.filter(pk=pk).update(
+                rating_count=expected_count, rating_sum=expected_sum, rating_histogram=expected
+            )
+            corrected += 1
@@ -0,0 +1,143 @@
+"""
+Windowed and per-category leaderboards.
+
+Completing a swap adds its points to a handful of LeaderboardRollup rows,
+one per (period, window start, category, user). A board is then a single
+indexed read of one window; SwapRequest history is never scanned.
+
+* Overall boards (category '') exist for the week and month windows; the
+  all-time overall board is UserProfile.points (see core.ranking).
+* Category boards credit the teacher of each side of the swap: the
+  requester teaches skill_offered and the receiver teaches skill_wanted.
+  They exist for week, month and all time.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import catalog
+from .models import LeaderboardRollup, SwapRequest, UserProfile
+
+ALL_TIME_START = datetime.date(1970, 1, 1)
+
+OVERALL_PERIODS = ('week', 'month')
+CATEGORY_PERIODS = ('week', 'month', 'all')
+
+# Windows kept by compact_leaderboards
+RETAIN_WEEKS = 12
+RETAIN_MONTHS = 12
+
+
+def period_start(period, day=None):
+    day = day or timezone.localdate()
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return ALL_TIME_START
+
+
+def swap_credits(swap_request):
+    """(user_id, category) pairs a completed swap counts towards"""
+    credits = set()
+    for user_id in (swap_request.requester_id, swap_request.receiver_id):
+        credits.add((user_id, ''))
+    credits.add((swap_request.requester_id, swap_request.skill_offered.category))
+    credits.add((swap_request.receiver_id, swap_request.skill_wanted.category))
+    return credits
+
+
+def record_swap_completion(swap_request, points, day=None):
+    """Add a completed swap's points to every window it belongs to"""
+    keys = []
+    for user_id, category in swap_credits(swap_request):
+        for period in (CATEGORY_PERIODS if category else OVERALL_PERIODS):
+            keys.append((period, period_start(period, day), category, user_id))
+
+    match_any = Q()
+    for period, start, category, user_id in keys:
+        match_any |= Q(period=period, period_start=start, category=category, user_id=user_id)
+    with transaction.atomic():
+        LeaderboardRollup.objects.bulk_create(
+            [
+                LeaderboardRollup(period=period, period_start=start, category=category, user_id=user_id)
+                for period, start, category, user_id in keys
+            ],
+            ignore_conflicts=True,
+        )
+        LeaderboardRollup.objects.filter(match_any).update(points=F('points') + points, swaps=F('swaps') + 1)
+
+
+def top(period='all', category='', limit=20):
+    """
+    Board entries as dicts with 'profile' and 'points', best first.
+    """
+    if period == 'all' and not category:
+        profiles = UserProfile.objects.filter(is_banned=False).select_related('user').order_by('-points')[:limit]
+        return [{'profile': profile, 'points': profile.points} for profile in profiles]
+
+    rollups = LeaderboardRollup.objects.filter(
+        period=period,
+        period_start=period_start(period),
+        category=category,
+        user__userprofile__is_banned=False,
+    ).select_related('user__userprofile').order_by('-points', 'user_id')[:limit]
+    return [{'profile': rollup.user.userprofile, 'points': rollup.points} for rollup in rollups]
+
+
+def categories():
+    # From the in-process skill catalog, already grouped and ordered by category
+    return list(catalog.skills_by_category())
+
+
+def expired_windows(retain_weeks=RETAIN_WEEKS, retain_months=RETAIN_MONTHS, day=None):
+    """Filter matching rollups for windows older than the retention limits"""
+    day = day or timezone.localdate()
+    oldest_week = period_start('week', day) - datetime.timedelta(weeks=retain_weeks - 1)
+    oldest_month = period_start('month', day)
+    for _ in range(retain_months - 1):
+        oldest_month = (oldest_month - datetime.timedelta(days=1)).replace(day=1)
+    return (
+        Q(period='week', period_start__lt=oldest_week) |
+        Q(period='month', period_start__lt=oldest_month)
+    )
+
+
+def compact(retain_weeks=RETAIN_WEEKS, retain_months=RETAIN_MONTHS, batch_size=1000, dry_run=False):
+    """Delete rollups of expired windows in primary-key batches; returns rows deleted"""
+    expired = LeaderboardRollup.objects.filter(expired_windows(retain_weeks, retain_months))
+    if dry_run:
+        return expired.count()
+    deleted = 0
+    while True:
+        ids = list(expired.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += LeaderboardRollup.objects.filter(pk__in=ids).delete()[0]
+
+
+def rebuild(points, day=None):
+    """Recreate every window from completed swaps (updated_at is taken as the completion time)"""
+    with transaction.atomic():
+        LeaderboardRollup.objects.all().delete()
+        totals = {}
+        completed = SwapRequest.objects.filter(status='completed').select_related('skill_offered', 'skill_wanted')
+        for swap_request in completed.iterator():
+            completed_on = timezone.localdate(swap_request.updated_at)
+            for user_id, category in swap_credits(swap_request):
+                for period in (CATEGORY_PERIODS if category else OVERALL_PERIODS):
+                    key = (period, period_start(period, completed_on), category, user_id)
+                    total = totals.setdefault(key, [0, 0])
+                    total[0] += points
+                    total[1] += 1
+        LeaderboardRollup.objects.bulk_create(
+            [
+                LeaderboardRollup(period=period, period_start=start, category=category, user_id=user_id,
+                                  points=total_points, swaps=swaps)
+                for (period, start, category, user_id), (total_points, swaps) in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
@@ -0,0 +1,226 @@
+"""
+Full-text search over user profiles and their skills.
+
+Every profile has a ProfileSearchDocument row holding its names, location,
+bio and offered/wanted skill text. The document table is indexed by the
+database itself, with the backend picked per connection vendor:
+
+* SQLite: an external-content FTS5 table kept in sync by triggers.
+* MySQL: a FULLTEXT index on the document columns.
+* Anything else (or SQLite built without FTS5): a plain icontains scan
+  over the document table.
+
+Searches return profile ids ordered by relevance. Results are capped at
+SEARCH_RESULT_LIMIT, so the work done per query depends on the index
+lookup and not on the size of the profile table. Callers pass the
+profiles they would show (public, not banned, matching their filters) so
+the cap is spent on those only.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import UserProfile, UserSkill, ProfileSearchDocument
+
+SEARCH_RESULT_LIMIT = getattr(settings, 'SEARCH_RESULT_LIMIT', 500)
+
+DOCUMENT_TABLE = ProfileSearchDocument._meta.db_table
+FTS_TABLE = 'core_profilesearch_fts'
+FULLTEXT_INDEX = 'core_profilesearch_ft'
+DOCUMENT_COLUMNS = ['name', 'location', 'bio', 'offered_skills', 'wanted_skills']
+
+# Column weights: names and offered skills matter most to people browsing
+FTS_WEIGHTS = [10.0, 2.0, 1.0, 8.0, 4.0]
+
+MAX_QUERY_TERMS = 8
+
+
+def _restrict(column, profiles):
+    """SQL condition limiting `column` to a values('id') queryset of profiles, and its params"""
+    if profiles is None:
+        return '', []
+    sql, params = profiles.query.sql_with_params()
+    return f' AND {column} IN ({sql})', list(params)
+
+
+def _terms(query):
+    """Split free text into lowercase word terms, dropping FTS operators"""
+    return re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]
+
+
+class SimpleSearchBackend:
+    """Fallback for databases without a supported full-text engine"""
+    name = 'simple'
+
+    def create_index(self, schema_editor):
+        pass
+
+    def drop_index(self, schema_editor):
+        pass
+
+    def search(self, query, limit, profiles=None):
+        documents = ProfileSearchDocument.objects.all()
+        if profiles is not None:
+            documents = documents.filter(profile_id__in=profiles)
+        for term in _terms(query):
+            term_filter = Q()
+            for column in DOCUMENT_COLUMNS:
+                term_filter |= Q(**{f'{column}__icontains': term})
+            documents = documents.filter(term_filter)
+        ids = documents.order_by('-profile__points').values_list('profile_id', flat=True)[:limit]
+        return [(profile_id, 0.0) for profile_id in ids]
+
+
+class SQLiteFTSBackend(SimpleSearchBackend):
+    name = 'sqlite-fts5'
+
+    def create_index(self, schema_editor):
+        columns = ', '.join(DOCUMENT_COLUMNS)
+        new_values = ', '.join(f'new.{column}' for column in DOCUMENT_COLUMNS)
+        old_values = ', '.join(f'old.{column}' for column in DOCUMENT_COLUMNS)
+        statements = [
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, "
+            f"content='{DOCUMENT_TABLE}', content_rowid='profile_id', "
+            f"tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENT_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.profile_id, {new_values}); END",
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENT_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.profile_id, {old_values}); END",
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.profile_id, {old_values}); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.profile_id, {new_values}); END",
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+        ]
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    def drop_index(self, schema_editor):
+        for suffix in ('_ai', '_ad', '_au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def search(self, query, limit, profiles=None):
+        terms = _terms(query)
+        if not terms:
+            return []
+        # Every term must match, as a word or the prefix of one
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        restrict, restrict_params = _restrict('rowid', profiles)
+        sql = (
+            f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s{restrict} ORDER BY score LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, *restrict_params, limit])
+            # bm25() is lower-is-better; flip it so callers can sort descending
+            return [(profile_id, -score) for profile_id, score in cursor.fetchall()]
+
+
+class MySQLFulltextBackend(SimpleSearchBackend):
+    name = 'mysql-fulltext'
+
+    def create_index(self, schema_editor):
+        schema_editor.execute(
+            f"ALTER TABLE {DOCUMENT_TABLE} ADD FULLTEXT INDEX {FULLTEXT_INDEX} ({', '.join(DOCUMENT_COLUMNS)})"
+        )
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(f'ALTER TABLE {DOCUMENT_TABLE} DROP INDEX {FULLTEXT_INDEX}')
+
+    def search(self, query, limit, profiles=None):
+        terms = _terms(query)
+        if not terms:
+            return []
+        match = ' '.join(f'+{term}*' for term in terms)
+        columns = ', '.join(DOCUMENT_COLUMNS)
+        restrict, restrict_params = _restrict('profile_id', profiles)
+        sql = (
+            f"SELECT profile_id, MATCH({columns}) AGAINST (%s IN BOOLEAN MODE) AS score "
+            f"FROM {DOCUMENT_TABLE} WHERE MATCH({columns}) AGAINST (%s IN BOOLEAN MODE){restrict} "
+            f"ORDER BY score DESC LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, match, *restrict_params, limit])
+            return [(profile_id, float(score)) for profile_id, score in cursor.fetchall()]
+
+
+def backend_for(conn):
+    """Pick the search backend for a database connection"""
+    if conn.vendor == 'sqlite':
+        if FTS_TABLE in conn.introspection.table_names():
+            return SQLiteFTSBackend()
+        return SimpleSearchBackend()
+    if conn.vendor == 'mysql':
+        return MySQLFulltextBackend()
+    return SimpleSearchBackend()
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = backend_for(connection)
+    return _backend
+
+
+def search_profiles(query, limit=SEARCH_RESULT_LIMIT, profiles=None):
+    """
+    Return [(profile_id, score), ...] best match first, among `profiles` (a
+    values('id') queryset of UserProfile) when given.
+    """
+    return get_backend().search(query, limit, profiles)
+
+
+def build_document(profile):
+    """Collect the searchable text for one profile"""
+    user = profile.user
+    offered, wanted = [], []
+    user_skills = UserSkill.objects.filter(user_id=profile.user_id).values_list(
+        'skill_type', 'skill__name', 'skill__description'
+    )
+    for skill_type, name, description in user_skills:
+        text = f'{name} {description}'.strip()
+        (offered if skill_type == 'offered' else wanted).append(text)
+    return {
+        'name': ' '.join(filter(None, [user.username, user.first_name, user.last_name])),
+        'location': profile.location or '',
+        'bio': profile.bio or '',
+        'offered_skills': '\n'.join(offered),
+        'wanted_skills': '\n'.join(wanted),
+    }
+
+
+def index_profile(profile):
+    ProfileSearchDocument.objects.update_or_create(profile=profile, defaults=build_document(profile))
+
+
+def index_user(user_id):
+    profile = UserProfile.objects.filter(user_id=user_id).select_related('user').first()
+    if profile is not None:
+        index_profile(profile)
+
+
+def rebuild_index(batch_size=500, stdout=None):
+    """Re-index every profile in primary-key batches; returns the number indexed"""
+    total = 0
+    last_pk = 0
+    while True:
+        profiles = list(
+            UserProfile.objects.filter(pk__gt=last_pk).select_related('user').order_by('pk')[:batch_size]
+        )
+        if not profiles:
+            break
+        for profile in profiles:
+            index_profile(profile)
+        total += len(profiles)
+        last_pk = profiles[-1].pk
+        if stdout is not None:
+            stdout.write(f'Indexed {total} profiles...')
+    # Drop documents whose profile no longer exists (e.g. raw deletes)
+    ProfileSearchDocument.objects.exclude(profile__in=UserProfile.objects.all()).delete()
+    return total
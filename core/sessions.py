@@ -0,0 +1,264 @@
+"""
+Cache-first session engine with batched database write-behind.
+
+With SESSION_SAVE_EVERY_REQUEST every page view saves the session to keep
+its expiry sliding. The stock engines turn each of those saves into an
+UPDATE on django_session. Here:
+
+* reads come from the cache; the database is read only on a cache miss,
+* a new session (a login, which cycles the key) is written to the
+  database straight away, so logins never depend on the cache,
+* a save that changes nothing and finds more than
+  SESSION_REFRESH_THRESHOLD seconds left before expiry does nothing at
+  all. Below the threshold the expiry is pushed out to the full age,
+* changed data and refreshed expiries go to the cache at once and into a
+  per-process buffer that is written with one bulk UPDATE once
+  SESSION_FLUSH_BATCH sessions are waiting, or by a background timer
+  SESSION_FLUSH_INTERVAL seconds after the first change was buffered
+  (and when the process exits),
+* a cache miss checks the buffer before the database, so a session whose
+  cache entry was evicted before its flush does not go back to the stale
+  row.
+
+Database writes therefore follow logins and refreshes rather than page
+views. An idle user's session lasts between the threshold and the full
+SESSION_COOKIE_AGE. The cache is the source of truth between flushes, so
+several workers need a shared cache (Redis or Memcached) for sessions.
+With a process-local cache (locmem, dummy) a logout in one worker would
+leave the session alive in the others, so the engine then behaves like
+the stock database engine; `check --deploy` warns about it (core.W001).
+
+Enable with SESSION_ENGINE = 'core.sessions'.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.db import connections
+
+KEY_PREFIX = 'core.sessions'
+
+logger = logging.getLogger('core.sessions')
+
+_pending = {}  # session key -> (encoded data, expire date), awaiting flush
+_pending_lock = threading.Lock()
+_timer = None  # flushes the buffer SESSION_FLUSH_INTERVAL after a change
+
+
+# Cache backends whose entries only the process that wrote them can see
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def cache_is_shared():
+    return settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def refresh_threshold():
+    return getattr(settings, 'SESSION_REFRESH_THRESHOLD', settings.SESSION_COOKIE_AGE // 2)
+
+
+def buffer(session_key, session_data, expire_date):
+    with _pending_lock:
+        _pending[session_key] = (session_data, expire_date)
+        due = len(_pending) >= getattr(settings, 'SESSION_FLUSH_BATCH', 100)
+        if not due:
+            _schedule_flush()
+    if due:
+        flush_pending()
+
+
+def _schedule_flush():
+    """Start the flush timer unless one is running; call with _pending_lock held"""
+    global _timer
+    if _timer is None:
+        # Without it a quiet process would hold its last changes until the next save
+        _timer = threading.Timer(getattr(settings, 'SESSION_FLUSH_INTERVAL', 30), _flush_on_timer)
+        _timer.daemon = True
+        _timer.start()
+
+
+def buffered(session_key):
+    """The (encoded data, expire date) waiting to be flushed for `session_key`, or None"""
+    with _pending_lock:
+        return _pending.get(session_key)
+
+
+def discard(session_key):
+    with _pending_lock:
+        _pending.pop(session_key, None)
+
+
+def _flush_on_timer():
+    try:
+        flush_pending()
+    finally:
+        # The timer thread opened its own connection; do not leave it behind
+        connections.close_all()
+
+
+def flush_pending():
+    """Write every buffered session with one bulk UPDATE; returns the number written"""
+    global _timer
+    with _pending_lock:
+        batch = dict(_pending)
+        _pending.clear()
+        if _timer is not None:
+            if _timer is not threading.current_thread():
+                _timer.cancel()
+            _timer = None
+    if not batch:
+        return 0
+    model = SessionStore.get_model_class()
+    try:
+        # An UPDATE, so sessions deleted meanwhile (logouts) are not recreated
+        model.objects.bulk_update(
+            [model(session_key=key, session_data=data, expire_date=expire_date)
+             for key, (data, expire_date) in batch.items()],
+            ['session_data', 'expire_date'],
+            batch_size=500,
+        )
+    except Exception:
+        logger.exception('Error flushing %d sessions; kept for the next flush', len(batch))
+        with _pending_lock:
+            for key, row in batch.items():
+                _pending.setdefault(key, row)
+            _schedule_flush()
+        return 0
+    return len(batch)
+
+
+atexit.register(flush_pending)
+
+
+class SessionStore(DBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._expires_at = None  # epoch seconds, known once loaded
+        self._write_through = False
+        # Otherwise every read and write goes to the database (DBStore)
+        self._shared = cache_is_shared()
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def _cache_set(self, data, expires_at):
+        self._expires_at = expires_at
+        try:
+            self._cache.set(
+                self.cache_key, {'data': data, 'expires_at': expires_at}, max(1, int(expires_at - time.time()))
+            )
+        except Exception:
+            logger.exception('Error saving to cache (%s)', self._cache)
+
+    def load(self):
+        if not self._shared:
+            return super().load()
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # Some backends (e.g. memcache) raise on invalid keys; treat as a miss
+            entry = None
+        if entry is not None and entry['expires_at'] > time.time():
+            self._expires_at = entry['expires_at']
+            return entry['data']
+
+        # A refresh still in the buffer is newer than the database row
+        row = buffered(self.session_key) if self.session_key else None
+        if row is not None and row[1].timestamp() > time.time():
+            session_data, expire_date = row
+            data = self.decode(session_data)
+            self._cache_set(data, expire_date.timestamp())
+            return data
+
+        s = self._get_session_from_db()
+        if s is None:
+            return {}
+        data = self.decode(s.session_data)
+        self._cache_set(data, s.expire_date.timestamp())
+        return data
+
+    def exists(self, session_key):
+        if not self._shared:
+            return super().exists(session_key)
+        return bool(session_key) and (self.cache_key_prefix + session_key) in self._cache or super().exists(session_key)
+
+    def create(self):
+        super().create()
+        # The request's own save follows (e.g. login storing the user id): write it through too
+        self._write_through = True
+
+    def save(self, must_create=False):
+        if not self._shared:
+            return super().save(must_create)
+        if must_create or self._write_through or self.session_key is None:
+            super().save(must_create)
+            discard(self.session_key)
+            self._cache_set(self._get_session(no_load=must_create), self.get_expiry_date().timestamp())
+            if not must_create:
+                self._write_through = False
+            return
+
+        data = self._get_session()
+        remaining = (self._expires_at or 0) - time.time()
+        if not self.modified and remaining > refresh_threshold():
+            return
+        expire_date = self.get_expiry_date()
+        self._cache_set(data, expire_date.timestamp())
+        buffer(self.session_key, self.encode(data), expire_date)
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        discard(session_key)
+        self._cache.delete(self.cache_key_prefix + session_key)
+
+    def flush(self):
+        """Remove the current session data from the database and regenerate the key"""
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
+
+    @classmethod
+    def clear_expired(cls):
+        # Buffered refreshes first, so clearsessions does not remove sessions still in use
+        flush_pending()
+        super().clear_expired()
+
+    # The async API runs the sync implementation in a thread
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def acreate(self):
+        return await sync_to_async(self.create)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    async def aflush(self):
+        return await sync_to_async(self.flush)()
+
+    @classmethod
+    async def aclear_expired(cls):
+        return await sync_to_async(cls.clear_expired)()
@@ -0,0 +1,173 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from . import awards, catalog, conversations, homepage, ranking, reviews, search, tasks
+from .models import Achievement, AdminMessage, Message, Rating, UserProfile, Skill, SwapRequest, UserSkill
+
+
+def deleting_user(origin):
+    """True while a User delete cascades, when per-user bookkeeping is moot"""
+    model = origin.model if hasattr(origin, 'model') else type(origin)
+    return model is User
+
+
+@receiver(post_save, sender=UserProfile)
+def index_saved_profile(sender, instance, **kwargs):
+    search.index_profile(instance)
+
+
+@receiver(post_save, sender=User)
+def index_renamed_user(sender, instance, created, **kwargs):
+    if not created:
+        search.index_user(instance.pk)
+
+
+@receiver(post_save, sender=UserSkill)
+@receiver(post_delete, sender=UserSkill)
+def index_user_skills(sender, instance, origin=None, **kwargs):
+    if deleting_user(origin):
+        return
+    search.index_user(instance.user_id)
+
+
+@receiver(post_save, sender=UserSkill)
+@receiver(post_delete, sender=UserSkill)
+def refresh_skill_summary(sender, instance, origin=None, **kwargs):
+    if deleting_user(origin):
+        return
+    UserProfile.refresh_skill_summary(instance.user_id)
+
+
+@receiver(post_save, sender=Skill)
+def refresh_renamed_skill_summaries(sender, instance, created, **kwargs):
+    if created:
+        return
+    user_ids = UserSkill.objects.filter(skill=instance).values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        UserProfile.refresh_skill_summary(user_id)
+        # Search documents hold the skill's name and description too
+        search.index_user(user_id)
+
+
+@receiver(post_save, sender=UserSkill)
+@receiver(post_delete, sender=UserSkill)
+def refresh_skill_matches(sender, instance, origin=None, **kwargs):
+    if deleting_user(origin):
+        return
+    tasks.refresh_matches.delay(instance.user_id)
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_match_state(sender, instance, **kwargs):
+    # Read through __dict__ so deferred fields are not loaded here
+    instance._match_state = (instance.__dict__.get('visibility'), instance.__dict__.get('is_banned'))
+
+
+@receiver(post_save, sender=UserProfile)
+def refresh_profile_matches(sender, instance, created, **kwargs):
+    state = (instance.visibility, instance.is_banned)
+    if not created and state != instance._match_state:
+        tasks.refresh_matches.delay(instance.user_id)
+    instance._match_state = state
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_rank_state(sender, instance, **kwargs):
+    # None until the profile is saved for the first time
+    instance._rank_state = None
+    if instance.pk is not None and 'points' in instance.__dict__ and 'is_banned' in instance.__dict__:
+        instance._rank_state = (instance.points, instance.is_banned)
+
+
+@receiver(post_save, sender=UserProfile)
+def update_leaderboard_rank(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not {'points', 'is_banned'} & set(update_fields):
+        return
+    if not created and instance._rank_state is None:
+        # Loaded with deferred fields, so the old values are unknown;
+        # rebuild_leaderboard reconciles any drift
+        return
+    state = (instance.points, instance.is_banned)
+    ranking.profile_changed(None if created else instance._rank_state, state)
+    instance._rank_state = state
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_leaderboard_rank(sender, instance, **kwargs):
+    ranking.profile_changed(instance._rank_state, None)
+
+
+@receiver(post_save, sender=UserSkill)
+def count_offered_skill(sender, instance, created, **kwargs):
+    if created and instance.skill_type == 'offered':
+        tasks.record_offered_skills.delay(instance.user_id, 1)
+
+
+@receiver(post_delete, sender=UserSkill)
+def uncount_offered_skill(sender, instance, origin=None, **kwargs):
+    # Recording would recreate the stats row of a user being deleted
+    if instance.skill_type == 'offered' and not deleting_user(origin):
+        tasks.record_offered_skills.delay(instance.user_id, -1)
+
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def reset_achievement_cache(sender, **kwargs):
+    awards.clear_cache()
+
+
+@receiver(post_save, sender=Message)
+def thread_saved_message(sender, instance, created, **kwargs):
+    if created:
+        conversations.record_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def unthread_deleted_message(sender, instance, origin=None, **kwargs):
+    # The user's threads go with them
+    if not deleting_user(origin):
+        conversations.discard_message(instance)
+
+
+@receiver(post_delete, sender=Rating)
+def discard_rating(sender, instance, **kwargs):
+    reviews.discard(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_home_user_blocks(sender, instance, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which the home page does not show
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    homepage.invalidate_stats()
+    homepage.invalidate_recent_profiles()
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=SwapRequest)
+@receiver(post_delete, sender=SwapRequest)
+def reset_home_stats(sender, **kwargs):
+    homepage.invalidate_stats()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=UserSkill)
+@receiver(post_delete, sender=UserSkill)
+def reset_home_recent_profiles(sender, **kwargs):
+    homepage.invalidate_recent_profiles()
+
+
+@receiver(post_save, sender=AdminMessage)
+@receiver(post_delete, sender=AdminMessage)
+def reset_home_admin_messages(sender, **kwargs):
+    homepage.invalidate_admin_messages()
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+def bump_skill_catalog(sender, **kwargs):
+    catalog.bump_on_commit()
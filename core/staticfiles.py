@@ -0,0 +1,186 @@
+"""
+Hashed, precompressed static files served with far-future caching.
+
+collectstatic with CompressedManifestStaticFilesStorage writes each file
+under a content-hashed name (app.3f9c2a.css) next to the original, and
+stores gzip (.gz) and, when the brotli package is installed, brotli (.br)
+copies of every compressible file. Compression runs once, at deploy time.
+
+StaticFilesMiddleware serves STATIC_ROOT from the Django process:
+
+* hashed names never change content, so they are sent with
+  Cache-Control: public, max-age=<1 year>, immutable; other names get a
+  short max-age so they are revalidated,
+* the smallest encoding the client accepts (br, gzip, identity) is sent
+  with Content-Encoding and Vary: Accept-Encoding,
+* every variant has a strong ETag, and If-None-Match is answered with 304.
+
+File lookups are cached per process; with DEBUG on they are rechecked on
+every request (runserver serves static files itself before this).
+"""
+import gzip
+import mimetypes
+import os
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MUTABLE_MAX_AGE = 60
+
+# Already compressed, or too small for compression to pay off
+SKIP_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.woff', '.woff2',
+                   '.gz', '.br', '.zip', '.mp3', '.mp4', '.webm', '.ogg'}
+MIN_COMPRESS_SIZE = 256
+
+
+def compressors():
+    """[(encoding, suffix, compress(bytes) -> bytes)] available here, preferred first"""
+    available = []
+    if brotli is not None:
+        available.append(('br', '.br', lambda data: brotli.compress(data, quality=11)))
+    available.append(('gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)))
+    return available
+
+
+def compress_file(path):
+    """Write compressed copies of `path` that are smaller than it; returns their encodings"""
+    if os.path.splitext(path)[1].lower() in SKIP_EXTENSIONS:
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+    written = []
+    for encoding, suffix, compress in compressors():
+        compressed = compress(data)
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(encoding)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz (and .br) copies of each collected file"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                names.add(name)
+                if hashed_name:
+                    names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(names):
+            compress_file(self.path(name))
+
+
+StaticFile = namedtuple('StaticFile', 'content_type immutable variants')
+# variants: {encoding: Variant}, 'identity' always present
+Variant = namedtuple('Variant', 'path size etag')
+
+_files = {}
+
+
+def hashed_names():
+    # Filled from staticfiles.json by manifest storages; empty otherwise
+    return set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def find(name):
+    """StaticFile for a name relative to STATIC_ROOT, or None"""
+    static_file = _files.get(name)
+    if static_file is not None and not settings.DEBUG:
+        return static_file
+    try:
+        path = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(path):
+        return None
+
+    variants = {}
+    for encoding, suffix in [('identity', '')] + [(encoding, suffix) for encoding, suffix, _ in compressors()]:
+        try:
+            stat = os.stat(path + suffix)
+        except FileNotFoundError:
+            continue
+        etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}-{encoding}"'
+        variants[encoding] = Variant(path + suffix, stat.st_size, etag)
+    if 'identity' not in variants:
+        return None
+    content_type, _ = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+        content_type += '; charset=utf-8'
+    static_file = StaticFile(content_type, name in hashed_names(), variants)
+    # Only files that exist are remembered, so probing random paths cannot grow this
+    _files[name] = static_file
+    return static_file
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def choose_variant(static_file, accept_encoding):
+    accepted = accepted_encodings(accept_encoding)
+    for encoding, _, _ in compressors():
+        if encoding in accepted and encoding in static_file.variants:
+            return encoding, static_file.variants[encoding]
+    return 'identity', static_file.variants['identity']
+
+
+def serve(request, name):
+    """Response for a static file, or None if there is no such file"""
+    static_file = find(name)
+    if static_file is None:
+        return None
+    encoding, variant = choose_variant(static_file, request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+    if static_file.immutable:
+        cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        cache_control = f'public, max-age={MUTABLE_MAX_AGE}'
+    headers = {'Cache-Control': cache_control, 'ETag': variant.etag}
+    if len(static_file.variants) > 1:
+        headers['Vary'] = 'Accept-Encoding'
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if if_none_match.strip() == '*' or variant.etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+        response = HttpResponseNotModified()
+    elif request.method == 'HEAD':
+        response = HttpResponse(content_type=static_file.content_type)
+        response['Content-Length'] = variant.size
+    else:
+        response = FileResponse(open(variant.path, 'rb'), content_type=static_file.content_type)
+        # Named after the .gz/.br file otherwise
+        del response['Content-Disposition']
+    if encoding != 'identity' and response.status_code == 200:
+        response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,252 @@
+"""
+Database-backed task queue.
+
+Work that does not have to finish before a response (achievements,
+leaderboard rollups, match refreshes, photo sizes) is queued as a Task
+row and run by the run_tasks command:
+
+    @task
+    def refresh_matches(user_id):
+        ...
+
+    refresh_matches.delay(user.pk)
+
+* delay() inserts the row once the current transaction commits, so a
+  rolled back request queues nothing and workers never see work whose
+  data is not committed yet. Arguments must be JSON serializable: pass
+  primary keys, not model instances.
+* Workers claim ready rows with SELECT ... FOR UPDATE SKIP LOCKED where
+  the database has it, then a conditional UPDATE per row, so several
+  workers (or hosts) never run the same task twice.
+* A task runs in one transaction together with the deletion of its row:
+  its database writes and its removal from the queue commit or roll back
+  together. The row is loaded and deleted only while it is still this
+  worker's claim (locked_by and attempts unchanged), so a task claimed
+  again after TASK_LOCK_TIMEOUT rolls back in the slow worker instead of
+  committing twice.
+* @task(unique=True) coalesces: delay() queues nothing while a row with
+  the same name and arguments is still queued, so a burst of events for
+  one user runs the task once.
+* A failed task is retried after an exponential backoff
+  (TASK_RETRY_DELAY doubling up to TASK_RETRY_MAX_DELAY) and left as
+  'failed' after max_attempts. A task claimed by a worker that died is
+  claimed again once TASK_LOCK_TIMEOUT has passed.
+
+With TASKS_EAGER on, delay() runs the task in-process after commit
+instead, for development without a worker.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+from .workers import pool as worker_pool
+
+logger = logging.getLogger('core.taskqueue')
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+class TaskLost(Exception):
+    """The task's row was claimed by another worker while this one ran it"""
+
+
+def task(func=None, *, max_attempts=None, unique=False):
+    """
+    Make `func` a task: calling it still runs it here and now, and
+    func.delay(*args, **kwargs) queues it for a worker. With unique, a
+    delay() while the same call is still queued adds nothing.
+    """
+    if func is None:
+        return lambda func: task(func, max_attempts=max_attempts, unique=unique)
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+
+    def delay(*args, **kwargs):
+        enqueue(func, args, kwargs, max_attempts, unique)
+
+    func.delay = delay
+    return func
+
+
+def enqueue(func, args, kwargs, max_attempts=None, unique=False):
+    # Fail in the caller, not in the worker, on arguments that cannot be stored
+    json.dumps([args, kwargs])
+    if setting('TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+
+    def insert():
+        # A queued row has not started yet, so it will see this change too;
+        # a running one may already have read the old data
+        if unique and Task.objects.filter(
+            name=func.task_name, args=list(args), kwargs=kwargs, status='queued'
+        ).exists():
+            return
+        Task.objects.create(
+            name=func.task_name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=max_attempts or setting('TASK_MAX_ATTEMPTS', 5),
+            run_at=timezone.now(),
+        )
+
+    transaction.on_commit(insert)
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a task that has failed `attempts` times"""
+    delay = min(setting('TASK_RETRY_DELAY', 10) * 2 ** (attempts - 1), setting('TASK_RETRY_MAX_DELAY', 3600))
+    # Jitter, so tasks that failed together are not retried together
+    return delay * random.uniform(0.75, 1.25)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, limit):
+    """Lock up to `limit` ready tasks for `worker`; returns their ids, oldest first"""
+    now = timezone.now()
+    ready = (
+        Q(status='queued', run_at__lte=now) |
+        Q(status='running', locked_at__lt=now - timedelta(seconds=setting('TASK_LOCK_TIMEOUT', 600)))
+    )
+    claimed = []
+    with transaction.atomic():
+        # Databases without row locks (SQLite) ignore select_for_update; the
+        # conditional UPDATE below is what keeps two workers apart there
+        candidates = list(
+            Task.objects.select_for_update(skip_locked=True).filter(ready)
+            .order_by('run_at', 'pk').values_list('pk', flat=True)[:limit]
+        )
+        for pk in candidates:
+            if Task.objects.filter(ready, pk=pk).update(
+                status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1
+            ):
+                claimed.append(pk)
+    return claimed
+
+
+def execute(pk, worker):
+    """Run one task claimed by `worker`; returns True if it succeeded"""
+    close_old_connections()
+    try:
+        task_row = Task.objects.filter(pk=pk, status='running', locked_by=worker).first()
+        if task_row is None:
+            return False
+        # The claim: a worker that takes the row over bumps attempts
+        claimed = Task.objects.filter(pk=pk, locked_by=worker, attempts=task_row.attempts)
+        try:
+            func = import_string(task_row.name)
+            if getattr(func, 'task_name', None) != task_row.name:
+                raise ImportError(f'{task_row.name} is not a task')
+            with transaction.atomic():
+                func(*task_row.args, **task_row.kwargs)
+                if not claimed.delete()[0]:
+                    raise TaskLost(f'Task {pk} was claimed by another worker')
+        except TaskLost:
+            logger.warning('Task %s %s ran past TASK_LOCK_TIMEOUT and was claimed again; rolled back',
+                           task_row.pk, task_row.name)
+            return False
+        except Exception:
+            fail(task_row, claimed, traceback.format_exc())
+            return False
+        return True
+    finally:
+        # Pool threads and processes are reused; do not leave stale connections open
+        close_old_connections()
+
+
+def fail(task_row, claimed, error):
+    if task_row.attempts >= task_row.max_attempts:
+        logger.error('Task %s %s failed for good after %d attempts:\n%s',
+                     task_row.pk, task_row.name, task_row.attempts, error)
+        changes = {'status': 'failed'}
+    else:
+        delay = backoff(task_row.attempts)
+        logger.warning('Task %s %s failed (attempt %d of %d), retrying in %.0fs:\n%s',
+                       task_row.pk, task_row.name, task_row.attempts, task_row.max_attempts, delay, error)
+        changes = {'status': 'queued', 'run_at': timezone.now() + timedelta(seconds=delay)}
+    claimed.update(locked_by='', locked_at=None, last_error=error, **changes)
+
+
+def retry_failed(queryset=None):
+    """Queue failed tasks again with fresh attempts; returns how many"""
+    queryset = Task.objects.all() if queryset is None else queryset
+    return queryset.filter(status='failed').update(
+        status='queued', attempts=0, run_at=timezone.now(), locked_by='', locked_at=None
+    )
+
+
+def work(workers=4, processes=False, once=False, poll_interval=1.0, stop=None):
+    """
+    Claim and run tasks on a pool of `workers` threads (or processes, see
+    core.workers) until `stop` is set, or, with once, until no task is ready.
+    Returns (succeeded, failed).
+    """
+    stop = stop or threading.Event()
+    worker = worker_name()
+    slots = threading.Semaphore(workers)
+    finished = threading.Event()
+    counts = {'succeeded': 0, 'failed': 0, 'running': 0}
+    lock = threading.Lock()
+
+    def done(succeeded):
+        with lock:
+            counts['succeeded' if succeeded else 'failed'] += 1
+            counts['running'] -= 1
+        slots.release()
+        finished.set()
+
+    if processes:
+        pool = worker_pool(workers)
+
+        def submit(pk):
+            pool.apply_async(execute, (pk, worker), callback=done, error_callback=lambda exc: done(False))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tasks')
+
+        def submit(pk):
+            pool.submit(execute, pk, worker).add_done_callback(lambda future: done(not future.exception() and future.result()))
+
+    try:
+        while not stop.is_set():
+            free = 0
+            while slots.acquire(blocking=False):
+                free += 1
+            claimed = claim(worker, free) if free else []
+            for _ in range(free - len(claimed)):
+                slots.release()
+            finished.clear()
+            for pk in claimed:
+                with lock:
+                    counts['running'] += 1
+                submit(pk)
+            if not claimed:
+                with lock:
+                    idle = counts['running'] == 0
+                if once and idle:
+                    break
+                # Woken early when a task finishes and frees a slot
+                finished.wait(poll_interval)
+    finally:
+        if processes:
+            pool.close()
+            pool.join()
+        else:
+            pool.shutdown(wait=True)
+    return counts['succeeded'], counts['failed']
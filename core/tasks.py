@@ -0,0 +1,63 @@
+"""
+Work deferred off the request path (see core.taskqueue).
+
+Each task takes primary keys and loads what it needs when it runs, and
+does nothing if the rows are gone by then (a user or message deleted
+while the task waited).
+"""
+import datetime
+
+from django.contrib.auth.models import User
+
+from . import awards, matching, rollups, thumbnails
+from .models import Message, Rating, SwapRequest
+from .taskqueue import task
+
+
+@task
+def record_swap_completion(swap_request_id, points, day):
+    """Leaderboard windows and achievements of a completed swap; `day` is the ISO completion date"""
+    swap_request = SwapRequest.objects.filter(pk=swap_request_id).select_related(
+        'skill_offered', 'skill_wanted'
+    ).first()
+    if swap_request is None:
+        return
+    rollups.record_swap_completion(swap_request, points, datetime.date.fromisoformat(day))
+    awards.swap_completed(swap_request)
+
+
+@task
+def record_swap_request(swap_request_id):
+    swap_request = SwapRequest.objects.filter(pk=swap_request_id).first()
+    if swap_request is not None:
+        awards.swap_requested(swap_request)
+
+
+@task
+def record_rating(rating_id):
+    rating = Rating.objects.filter(pk=rating_id).first()
+    if rating is not None:
+        awards.rating_received(rating)
+
+
+@task
+def record_message(message_id):
+    message = Message.objects.filter(pk=message_id).first()
+    if message is not None:
+        awards.message_sent(message)
+
+
+@task
+def record_offered_skills(user_id, delta):
+    if User.objects.filter(pk=user_id).exists():
+        awards.offered_skills_changed(user_id, delta)
+
+
+@task(unique=True)
+def refresh_matches(user_id):
+    matching.refresh_user_matches(user_id)
+
+
+@task
+def render_photo(profile_pk):
+    thumbnails.render(profile_pk)
@@ -0,0 +1,11 @@
+from django import template
+
+from core import catalog
+
+register = template.Library()
+
+
+@register.filter
+def skill_name(skill_id):
+    """Name of a skill by id, from the in-process catalog: {{ swap.skill_offered_id|skill_name }}"""
+    return catalog.skill_name(skill_id)
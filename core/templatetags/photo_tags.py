@@ -0,0 +1,38 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def profile_photo(profile, size='avatar', **attrs):
+    """
+    A profile photo at one of the pre-rendered sizes (see core.thumbnails),
+    WebP with a JPEG fallback, or the original until it is rendered:
+    {% profile_photo profile 'avatar' class='profile-img me-3' alt=user.username %}
+    """
+    if not profile.profile_photo:
+        return ''
+    rendition = profile.photo_renditions.get(size)
+    if rendition is None:
+        return format_html('<img src="{}"{}>', profile.profile_photo.url, flatatt(attrs))
+    storage = profile.profile_photo.storage
+    img = format_html(
+        '<img src="{}" width="{}" height="{}" loading="lazy"{}>',
+        storage.url(rendition['jpeg']), rendition['width'], rendition['height'], flatatt(attrs),
+    )
+    if 'webp' not in rendition:
+        return img
+    return format_html('<picture><source srcset="{}" type="image/webp">{}</picture>', storage.url(rendition['webp']), img)
+
+
+@register.filter
+def photo_url(profile, size='full'):
+    """URL of one size of a profile photo (JPEG), or of the original: {{ profile|photo_url:'full' }}"""
+    if not profile.profile_photo:
+        return ''
+    rendition = profile.photo_renditions.get(size)
+    if rendition is None:
+        return profile.profile_photo.url
+    return profile.profile_photo.storage.url(rendition['jpeg'])
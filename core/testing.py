@@ -0,0 +1,37 @@
+"""
+Test helpers for per-view query budgets.
+
+    class BrowseTests(QueryBudgetTestMixin, TestCase):
+        def test_browse_budget(self):
+            self.client.force_login(self.user)
+            self.assertWithinQueryBudget(reverse('browse_users'))
+
+assert_within_budget works with any Django test client (pytest included):
+it requests the path, resolves its URL name and checks the configured
+budget, or explicit limits passed as keyword arguments.
+"""
+from django.urls import resolve
+
+from .querybudget import QueryRecorder, budget_for, report, violations
+
+
+def assert_within_budget(client, path, method='get', data=None, **limits):
+    """
+    Request `path` and raise AssertionError if it runs more SQL than its
+    budget allows; returns the response. `limits` (queries, db_time_ms,
+    repeats) override settings.QUERY_BUDGETS for this call.
+    """
+    url_name = resolve(path.split('?')[0]).url_name
+    budget = budget_for(url_name)
+    budget.update(limits)
+    with QueryRecorder() as recorder:
+        response = getattr(client, method)(path, data)
+    problems = violations(recorder, budget)
+    if problems:
+        raise AssertionError(report(url_name or path, recorder, problems))
+    return response
+
+
+class QueryBudgetTestMixin:
+    def assertWithinQueryBudget(self, path, method='get', data=None, **limits):
+        return assert_within_budget(self.client, path, method, data, **limits)
@@ -0,0 +1,222 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from . import awards, checks, conversations, matching, points, unread, urls
+from .context_processors import unread_messages
+from .models import Conversation, Message, Skill, SwapRequest, UserProfile, UserSkill, UserStats
+from .querybudget import QueryRecorder
+from .sessions import SessionStore
+from .testing import QueryBudgetTestMixin
+
+
+class UnreadCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='password')
+        cls.bob = User.objects.create_user('bob', password='password')
+        for user in (cls.alice, cls.bob):
+            UserProfile.objects.create(user=user)
+        conversations.send_message(cls.bob, cls.alice, 'hello')
+        conversations.send_message(cls.bob, cls.alice, 'are you there?')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.alice)
+
+    def unread_queries(self, captured):
+        table = Conversation._meta.db_table
+        return [query['sql'] for query in captured if table in query['sql'] and 'SUM(' in query['sql'].upper()]
+
+    def test_cold_cache_is_rebuilt_from_conversations(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(unread.get(self.alice.pk), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.get(self.alice.pk), 2)
+
+    def test_context_processor_reads_warm_counter_without_queries(self):
+        unread.get(self.alice.pk)
+        request = RequestFactory().get('/')
+        request.user = self.alice
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_messages(request), {'unread_messages_count': 2})
+
+    def test_pages_do_not_count_unread_messages_with_warm_counter(self):
+        unread.get(self.alice.pk)
+        for name in ('home', 'dashboard'):
+            with self.subTest(view=name):
+                with CaptureQueriesContext(connection) as captured:
+                    response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['unread_messages_count'], 2)
+                self.assertEqual(self.unread_queries(captured), [])
+
+    def test_counter_follows_sends_and_reads(self):
+        self.assertEqual(unread.get(self.alice.pk), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            conversations.send_message(self.bob, self.alice, 'one more')
+        self.assertEqual(unread.get(self.alice.pk), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            conversations.mark_read(self.alice, self.bob)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.get(self.alice.pk), 0)
+
+
+
+class ConversationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='password')
+        cls.bob = User.objects.create_user('bob', password='password')
+        for user in (cls.alice, cls.bob):
+            UserProfile.objects.create(user=user)
+
+    def setUp(self):
+        cache.clear()
+
+    def thread(self, user, other_user):
+        return Conversation.objects.get(user=user, other_user=other_user)
+
+    def test_mark_read_clamps_a_drifted_count(self):
+        conversations.send_message(self.bob, self.alice, 'hello')
+        conversations.send_message(self.bob, self.alice, 'are you there?')
+        Conversation.objects.filter(user=self.alice).update(unread_count=1)
+        self.assertEqual(conversations.mark_read(self.alice, self.bob), 2)
+        self.assertEqual(self.thread(self.alice, self.bob).unread_count, 0)
+
+    def test_messages_saved_outside_send_message_reach_the_threads(self):
+        message = Message.objects.create(sender=self.bob, receiver=self.alice, content='from the admin')
+        thread = self.thread(self.alice, self.bob)
+        self.assertEqual((thread.last_message_id, thread.unread_count), (message.pk, 1))
+        self.assertEqual(self.thread(self.bob, self.alice).last_message_id, message.pk)
+
+    def test_deleting_messages_rewinds_and_then_removes_the_threads(self):
+        first = conversations.send_message(self.alice, self.bob, 'hi')
+        second = conversations.send_message(self.bob, self.alice, 'hello')
+        self.assertEqual(unread.get(self.alice.pk), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        thread = self.thread(self.alice, self.bob)
+        self.assertEqual((thread.last_message_id, thread.last_sender_is_user, thread.unread_count), (first.pk, True, 0))
+        self.assertEqual(unread.get(self.alice.pk), 0)
+        first.delete()
+        self.assertFalse(Conversation.objects.exists())
+
+
+class ProfileEditTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='password')
+        UserProfile.objects.create(user=cls.alice)
+
+    def test_save_keeps_columns_written_meanwhile(self):
+        self.client.force_login(self.alice)
+        stale = UserProfile.objects.get(user=self.alice)
+        # An award and a rating commit between the view's read and its save
+        UserProfile.objects.filter(pk=stale.pk).update(points=50, rating_count=1, rating_sum=5)
+        data = {'location': 'Lisbon', 'bio': 'Hi', 'availability': 'weekends', 'visibility': 'public'}
+        with mock.patch.object(UserProfile.objects, 'get_or_create', return_value=(stale, False)):
+            response = self.client.post(reverse('profile_edit'), data)
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        profile = UserProfile.objects.get(pk=stale.pk)
+        self.assertEqual((profile.location, profile.points, profile.rating_count), ('Lisbon', 50, 1))
+
+
+class AwardTests(TestCase):
+    def test_swaps_count_towards_the_role_taken(self):
+        alice, bob = (User.objects.create_user(name) for name in ('alice', 'bob'))
+        python = Skill.objects.create(name='Python', category='Programming', is_approved=True)
+        guitar = Skill.objects.create(name='Guitar', category='Music', is_approved=True)
+        for _ in range(2):
+            swap_request = SwapRequest.objects.create(requester=alice, receiver=bob, skill_offered=python,
+                                                      skill_wanted=guitar, message='Swap?')
+            points.complete_swap(swap_request)
+            awards.swap_completed(swap_request)
+        counters = ('swaps_completed', 'swaps_taught', 'swaps_learned', 'skills_learned')
+        recorded = {stats.user_id: [getattr(stats, name) for name in counters] for stats in UserStats.objects.all()}
+        self.assertEqual(recorded, {alice.pk: [2, 0, 2, 1], bob.pk: [2, 2, 0, 1]})
+        # The backfill arrives at the same counters
+        computed = awards.compute_stats([alice.pk, bob.pk])
+        self.assertEqual({user_id: [stats[name] for name in counters] for user_id, stats in computed.items()},
+                         recorded)
+
+
+class SessionStoreTests(TestCase):
+    def test_process_local_cache_falls_back_to_the_database(self):
+        store = SessionStore()
+        store['user'] = 'alice'
+        store.save()
+        self.assertEqual(SessionStore(store.session_key).load(), {'user': 'alice'})
+        # A logout served by another process removes only the row
+        Session.objects.filter(session_key=store.session_key).delete()
+        self.assertEqual(SessionStore(store.session_key).load(), {})
+        self.assertEqual([warning.id for warning in checks.check_session_cache(None)], ['core.W001'])
+
+    def test_database_engine_needs_no_shared_cache(self):
+        with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db'):
+            self.assertEqual(checks.check_session_cache(None), [])
+
+# Named routes a GET cannot be measured on: they log out, change data or stream until disconnected
+UNBUDGETED_ROUTES = {'logout', 'skill_delete', 'handle_swap_request', 'notifications_stream'}
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Every named route, requested as a user with data to show, stays within QUERY_BUDGETS"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='password')
+        cls.others = [User.objects.create_user(f'user{n}', password='password') for n in range(8)]
+        python = Skill.objects.create(name='Python', category='Programming', is_approved=True)
+        guitar = Skill.objects.create(name='Guitar', category='Music', is_approved=True)
+        for user in [cls.alice] + cls.others:
+            UserProfile.objects.create(user=user, visibility='public')
+        cls.user_skill = UserSkill.objects.create(user=cls.alice, skill=python, skill_type='offered', level='expert')
+        UserSkill.objects.create(user=cls.alice, skill=guitar, skill_type='wanted', level='beginner')
+        for other in cls.others:
+            UserSkill.objects.create(user=other, skill=guitar, skill_type='offered', level='intermediate')
+            UserSkill.objects.create(user=other, skill=python, skill_type='wanted', level='beginner')
+            # Several rows per list, so a per-row query shows up as a repeat
+            for requester, receiver in ((other, cls.alice), (cls.alice, other)):
+                SwapRequest.objects.create(requester=requester, receiver=receiver, skill_offered=python,
+                                           skill_wanted=guitar, message='Swap?')
+            cls.completed = SwapRequest.objects.create(requester=other, receiver=cls.alice, skill_offered=guitar,
+                                                       skill_wanted=python, message='Swap?')
+            points.complete_swap(cls.completed)
+            conversations.send_message(other, cls.alice, 'hello')
+            conversations.send_message(cls.alice, other, 'hi!')
+        for user in [cls.alice] + cls.others:
+            matching.refresh_user_matches(user.pk)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.alice)
+
+    def test_views_within_budget(self):
+        arguments = {
+            'username': self.others[0].username,
+            'request_id': self.completed.pk,
+            'skill_id': self.user_skill.pk,
+        }
+        for pattern in urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in UNBUDGETED_ROUTES:
+                continue
+            path = reverse(pattern.name, kwargs={name: arguments[name] for name in pattern.pattern.converters})
+            with self.subTest(view=pattern.name):
+                response = self.assertWithinQueryBudget(path)
+                self.assertLess(response.status_code, 400)
+
+    def test_transaction_control_is_not_counted(self):
+        recorder = QueryRecorder()
+        # SQLite's BEGIN goes through the cursor, so every atomic block outside a test would record one
+        for sql in ('BEGIN', 'SELECT 1', 'COMMIT', 'BEGIN IMMEDIATE', 'SELECT 1', 'ROLLBACK',
+                    'SAVEPOINT "s1_x1"', 'RELEASE SAVEPOINT "s1_x1"', 'ROLLBACK TO SAVEPOINT "s1_x2"'):
+            recorder(lambda sql, params, many, context: None, sql, None, False, {})
+        self.assertEqual(recorder.count, 2)
+        self.assertEqual(dict(recorder.fingerprints), {'SELECT 1': 2})
@@ -0,0 +1,190 @@
+"""
+Pre-rendered profile photo sizes.
+
+Uploads are stored as they arrive; pages never serve them directly. Each
+photo is rendered once into fixed sizes, each as WebP (when Pillow has
+WebP support) and JPEG:
+
+* avatar: 100px square, for the 48-50px avatars in lists and chat,
+* card: 240px square, for the 80-120px profile cards,
+* full: at most 800px on the longest side, aspect kept.
+
+The paths and sizes go in UserProfile.photo_renditions and the original's
+dimensions in photo_width/photo_height. Until a photo is rendered, pages
+fall back to the original (see templatetags/photo_tags.py).
+
+Rendering runs off the request: profile_edit queues a render_photo task
+(see core.tasks), and backfill_thumbnails renders existing photos in
+worker processes. Both use render_files(), which reads and writes files
+only, and apply(), which records the result unless the photo was replaced
+meanwhile.
+"""
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from . import homepage
+from .models import UserProfile
+from .workers import pool as worker_pool
+
+# name -> (longest edge in px, crop to a square)
+SIZES = {
+    'avatar': (100, True),
+    'card': (240, True),
+    'full': (800, False),
+}
+
+FORMATS = [
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+]
+
+
+def formats():
+    return [fmt for fmt in FORMATS if fmt[0] != 'webp' or features.check('webp')]
+
+
+def rendition_path(profile_pk, photo_name, size, ext):
+    # Keyed by the original's name, so a new upload gets new URLs
+    digest = hashlib.sha1(photo_name.encode()).hexdigest()[:10]
+    return f'profiles/thumbs/{profile_pk}/{size}-{digest}.{ext}'
+
+
+def _encode(image, fmt, options):
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha; flatten onto white
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def render_files(storage, profile_pk, photo_name):
+    """
+    Write every size of one photo to `storage`; returns (width, height,
+    renditions). Touches files only, never the database.
+    """
+    with storage.open(photo_name, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    width, height = image.size
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    renditions = {}
+    for size, (edge, square) in SIZES.items():
+        if square:
+            thumb = ImageOps.fit(image, (edge, edge), Image.Resampling.LANCZOS)
+        else:
+            thumb = image.copy()
+            thumb.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        rendition = {'width': thumb.width, 'height': thumb.height}
+        for ext, fmt, options in formats():
+            path = rendition_path(profile_pk, photo_name, size, ext)
+            if storage.exists(path):
+                storage.delete(path)
+            rendition[ext] = storage.save(path, ContentFile(_encode(thumb, fmt, options)))
+        renditions[size] = rendition
+    return width, height, renditions
+
+
+def rendition_files(renditions):
+    return {path for rendition in renditions.values() for ext, path in rendition.items() if ext in ('webp', 'jpeg')}
+
+
+def apply(storage, profile_pk, photo_name, width, height, renditions, previous):
+    """
+    Record rendered sizes unless the profile's photo changed meanwhile, and
+    delete files no longer referenced; returns whether they were recorded.
+    """
+    recorded = UserProfile.objects.filter(pk=profile_pk, profile_photo=photo_name).update(
+        photo_width=width, photo_height=height, photo_renditions=renditions
+    )
+    if recorded:
+        stale = rendition_files(previous) - rendition_files(renditions)
+        # The home page caches its recent member cards
+        homepage.invalidate_recent_profiles()
+    else:
+        # Replaced while rendering; nothing refers to these files
+        stale = rendition_files(renditions)
+    for path in stale:
+        storage.delete(path)
+    return bool(recorded)
+
+
+# The columns reset() changes, for saving with update_fields
+RENDITION_FIELDS = ['photo_width', 'photo_height', 'photo_renditions']
+
+
+def reset(profile):
+    """
+    Forget the sizes of a photo being replaced or removed; their files are
+    deleted after commit. Call before saving the profile.
+    """
+    storage = profile.profile_photo.storage
+    stale = rendition_files(profile.photo_renditions)
+    profile.photo_width = profile.photo_height = None
+    profile.photo_renditions = {}
+
+    def delete_files():
+        for path in stale:
+            storage.delete(path)
+
+    transaction.on_commit(delete_files)
+
+
+def render(profile_pk):
+    """Render and record one profile's photo; returns whether anything was recorded"""
+    profile = UserProfile.objects.filter(pk=profile_pk).only('pk', 'profile_photo', 'photo_renditions').first()
+    if profile is None or not profile.profile_photo:
+        return False
+    storage = profile.profile_photo.storage
+    name = profile.profile_photo.name
+    width, height, renditions = render_files(storage, profile.pk, name)
+    return apply(storage, profile.pk, name, width, height, renditions, profile.photo_renditions)
+
+
+# Backfill: files are rendered in worker processes, results recorded here
+
+def _render_job(job):
+    profile_pk, photo_name = job
+    storage = UserProfile._meta.get_field('profile_photo').storage
+    try:
+        return profile_pk, photo_name, render_files(storage, profile_pk, photo_name), None
+    except Exception as exc:
+        return profile_pk, photo_name, None, f'{type(exc).__name__}: {exc}'
+
+
+def backfill(workers=None, chunk_size=10, force=False, stdout=None):
+    """
+    Render every profile photo without sizes (all photos with force) in
+    worker processes; returns (rendered, failed).
+    """
+    profiles = UserProfile.objects.exclude(profile_photo='')
+    if not force:
+        profiles = profiles.filter(photo_renditions={})
+    jobs = list(profiles.order_by('pk').values_list('pk', 'profile_photo'))
+    previous = dict(profiles.values_list('pk', 'photo_renditions')) if force else {}
+    storage = UserProfile._meta.get_field('profile_photo').storage
+
+    rendered = failed = 0
+    with worker_pool(workers or os.cpu_count()) as pool:
+        for profile_pk, photo_name, result, error in pool.imap_unordered(_render_job, jobs, chunksize=chunk_size):
+            if error:
+                failed += 1
+                if stdout is not None:
+                    stdout.write(f'Profile {profile_pk}: {photo_name}: {error}')
+                continue
+            width, height, renditions = result
+            if apply(storage, profile_pk, photo_name, width, height, renditions, previous.get(profile_pk, {})):
+                rendered += 1
+            if stdout is not None and (rendered + failed) % 100 == 0:
+                stdout.write(f'Rendered {rendered} photos...')
+    return rendered, failed
@@ -0,0 +1,86 @@
+"""
+Per-user unread message counter.
+
+The count lives in the cache under unread:<user_id> so the navbar badge
+(core.context_processors.unread_messages) is a cache read with no query.
+Sending a message increments it and marking messages read decrements it,
+both after the transaction commits. On a cache miss the count is rebuilt
+from the Conversation rows, which are the durable per-thread counters.
+
+Each entry expires after UNREAD_CACHE_TIMEOUT seconds, which bounds drift
+when several processes use a local-memory cache; with a shared cache
+(Redis/Memcached) the counter is exact. reconcile() (the
+reconcile_unread command) repairs both the Conversation rows and the cache
+from the Message table.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from .models import Conversation, Message
+
+TIMEOUT = getattr(settings, 'UNREAD_CACHE_TIMEOUT', 300)
+
+
+def cache_key(user_id):
+    return f'unread:{user_id}'
+
+
+def count_from_db(user_id):
+    return Conversation.objects.filter(user_id=user_id).aggregate(total=Sum('unread_count'))['total'] or 0
+
+
+def get(user_id):
+    count = cache.get(cache_key(user_id))
+    if count is None:
+        count = count_from_db(user_id)
+        cache.add(cache_key(user_id), count, TIMEOUT)
+    return max(count, 0)
+
+
+def incr(user_id, delta=1):
+    # A missing key is left missing; the next get() rebuilds it from the DB
+    try:
+        cache.incr(cache_key(user_id), delta)
+    except ValueError:
+        pass
+
+
+def decr(user_id, delta=1):
+    incr(user_id, -delta)
+
+
+def reconcile(batch_size=1000, stdout=None):
+    """
+    Reset Conversation.unread_count to the real number of unread messages
+    per thread, in batches of receivers, and refresh their cached totals.
+    Returns the number of threads corrected.
+    """
+    corrected = 0
+    last_user_id = 0
+    while True:
+        user_ids = list(
+            Conversation.objects.filter(user_id__gt=last_user_id).order_by('user_id')
+            .values_list('user_id', flat=True).distinct()[:batch_size]
+        )
+        if not user_ids:
+            return corrected
+        last_user_id = user_ids[-1]
+        actual = {
+            (receiver_id, sender_id): count
+            for receiver_id, sender_id, count in Message.objects.filter(receiver_id__in=user_ids, is_read=False)
+            .order_by().values('receiver_id', 'sender_id').annotate(n=Count('id'))
+            .values_list('receiver_id', 'sender_id', 'n')
+        }
+        totals = dict.fromkeys(user_ids, 0)
+        for pk, user_id, other_user_id, cached in Conversation.objects.filter(user_id__in=user_ids).values_list(
+            'pk', 'user_id', 'other_user_id', 'unread_count'
+        ):
+            count = actual.get((user_id, other_user_id), 0)
+            totals[user_id] += count
+            if count != cached:
+                if stdout is not None:
+                    stdout.write(f'Conversation {pk}: cached {cached} unread, actual {count}')
+                Conversation.objects.filter(pk=pk).update(unread_count=count)
+                corrected += 1
+        cache.set_many({cache_key(user_id): total for user_id, total in totals.items()}, TIMEOUT)
@@ -13,12 +13,15 @@ urlpatterns = [
     path('skills/add/', views.add_skill_to_user, name='add_skill_to_user'),
     path('browse/', views.browse_users, name='browse_users'),
     path('user/<str:username>/', views.user_profile, name='user_profile'),
+    path('user/<str:username>/reviews/', views.user_reviews, name='user_reviews'),
     path('swap/request/<str:username>/', views.send_swap_request, name='send_swap_request'),
     path('swap/requests/', views.swap_requests, name='swap_requests'),
     path('swap/handle/<int:request_id>/<str:action>/', views.handle_swap_request, name='handle_swap_request'),
     path('rate/<int:request_id>/', views.rate_user, name='rate_user'),
     path('messages/', views.messages_view, name='messages'),
     path('chat/<str:username>/', views.chat_with_user, name='chat_with_user'),
+    path('chat/<str:username>/history/', views.chat_history, name='chat_history'),
+    path('notifications/stream/', views.notifications_stream, name='notifications_stream'),
     path('leaderboard/', views.leaderboard, name='leaderboard'),
     path('achievements/', views.achievements, name='achievements'),
 ]
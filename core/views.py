@@ -1,34 +1,33 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Q, Avg, Count
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import Case, When, IntegerField
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.core.paginator import Paginator
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.cache import never_cache
 from .models import *
 from .forms import *
+from . import catalog, conversations, homepage, matching, notifications, points, ranking, reviews, rollups, search, tasks, thumbnails, unread
+from .pagination import KeysetPaginator
 
 def home(request):
-    total_users = User.objects.count()
-    total_skills = Skill.objects.count()
-    total_swaps = SwapRequest.objects.filter(status='completed').count()
-    recent_users = UserProfile.objects.filter(visibility='public').order_by('-created_at')[:6]
+    # Stats are cached; the two querysets are lazy and only run when their
+    # cached fragment in home.html has expired or been invalidated
+    recent_users = UserProfile.objects.filter(visibility='public', is_banned=False).select_related('user').order_by('-created_at', '-id')[:6]
     admin_messages = AdminMessage.objects.filter(is_active=True).order_by('-created_at')[:3]
-    
-    unread_messages_count = 0
-    if request.user.is_authenticated:
-        unread_messages_count = Message.objects.filter(receiver=request.user, is_read=False).count()
 
     context = {
-        'total_users': total_users,
-        'total_skills': total_skills,
-        'total_swaps': total_swaps,
+        **homepage.stats(),
         'recent_users': recent_users,
         'admin_messages': admin_messages,
-        'unread_messages_count': unread_messages_count,
+        'home_cache_timeout': homepage.TIMEOUT,
     }
     return render(request, 'core/home.html', context)
 
@@ -89,19 +88,13 @@ def dashboard(request):
     # Ensure user has a profile
     profile, created = UserProfile.objects.get_or_create(user=request.user)
     
-    offered_skills = UserSkill.objects.filter(user=request.user, skill_type='offered').select_related('skill')
-    wanted_skills = UserSkill.objects.filter(user=request.user, skill_type='wanted').select_related('skill')
-    pending_requests = SwapRequest.objects.filter(receiver=request.user, status='pending').select_related('requester', 'skill_offered', 'skill_wanted')
-    sent_requests = SwapRequest.objects.filter(requester=request.user, status='pending').select_related('receiver', 'skill_offered', 'skill_wanted')
-    recent_messages = Message.objects.filter(receiver=request.user, is_read=False).select_related('sender')[:5]
-    unread_messages_count = Message.objects.filter(receiver=request.user, is_read=False).count()
-    
-    # Skill match suggestions
-    user_wanted_skills = wanted_skills.values_list('skill', flat=True)
-    suggested_matches = UserSkill.objects.filter(
-        skill__in=user_wanted_skills,
-        skill_type='offered'
-    ).exclude(user=request.user).select_related('user', 'skill')[:5]
+    offered_skills = UserSkill.objects.filter(user=request.user, skill_type='offered')
+    wanted_skills = UserSkill.objects.filter(user=request.user, skill_type='wanted')
+    pending_requests = SwapRequest.objects.filter(receiver=request.user, status='pending').select_related('requester')
+    sent_requests = SwapRequest.objects.filter(requester=request.user, status='pending').select_related('receiver')
+    
+    # Reciprocal skill match suggestions, best first
+    suggested_matches = matching.suggested_matches(profile, limit=5)
     
     context = {
         'profile': profile,
@@ -109,9 +102,7 @@ def dashboard(request):
         'wanted_skills': wanted_skills,
         'pending_requests': pending_requests,
         'sent_requests': sent_requests,
-        'recent_messages': recent_messages,
         'suggested_matches': suggested_matches,
-        'unread_messages_count': unread_messages_count,
     }
     return render(request, 'core/dashboard.html', context)
 
@@ -121,7 +112,20 @@ def profile_edit(request):
     if request.method == 'POST':
         form = UserProfileForm(request.POST, request.FILES, instance=profile)
         if form.is_valid():
-            form.save()
+            photo_changed = 'profile_photo' in form.changed_data
+            # Only the form's columns: points, rating aggregates and skill
+            # summaries are kept by their own UPDATEs and may have changed
+            # since the profile was read
+            update_fields = [*form.Meta.fields, 'updated_at']
+            with transaction.atomic():
+                if photo_changed:
+                    # Pages show the original until the new sizes are rendered
+                    thumbnails.reset(profile)
+                    update_fields += thumbnails.RENDITION_FIELDS
+                profile = form.save(commit=False)
+                profile.save(update_fields=update_fields)
+                if photo_changed and profile.profile_photo:
+                    tasks.render_photo.delay(profile.pk)
             messages.success(request, 'Profile updated successfully!')
             return redirect('dashboard')
         else:
@@ -151,7 +155,7 @@ def skills_manage(request):
         'offered_skills': offered_skills,
         'wanted_skills': wanted_skills,
         'skill_form': skill_form,
-        'all_skills': Skill.objects.filter(is_approved=True).order_by('category', 'name'),
+        'all_skills': catalog.approved_skills(),
     }
     return render(request, 'core/skills_manage.html', context)
 
@@ -197,33 +201,54 @@ def add_skill_to_user(request):
 def browse_users(request):
     form = SearchForm(request.GET)
     users = UserProfile.objects.filter(visibility='public', is_banned=False).select_related('user')
+    ordering = ('-created_at', '-id')
     
     if form.is_valid():
         query = form.cleaned_data.get('query')
         category = form.cleaned_data.get('category')
         level = form.cleaned_data.get('level')
         
-        if query:
-            users = users.filter(
-                Q(user__username__icontains=query) |
-                Q(user__first_name__icontains=query) |
-                Q(user__last_name__icontains=query) |
-                Q(location__icontains=query)
-            )
-        
+        # Subqueries rather than joins so no DISTINCT is needed
         if category:
-            users = users.filter(user__userskill__skill__category__icontains=category).distinct()
+            users = users.filter(user__in=UserSkill.objects.filter(skill__category__icontains=category).values('user'))
         
         if level:
-            users = users.filter(user__userskill__level=level).distinct()
+            users = users.filter(user__in=UserSkill.objects.filter(level=level).values('user'))
+        
+        if query:
+            # Ranked lookup through the full-text index, best match first. The
+            # filters above go into the lookup, so hidden profiles take no slots
+            ranked_ids = [
+                profile_id for profile_id, score in search.search_profiles(query, profiles=users.values('id'))
+            ]
+            users = users.filter(id__in=ranked_ids).annotate(
+                search_rank=Case(
+                    *[When(id=profile_id, then=position) for position, profile_id in enumerate(ranked_ids)],
+                    default=len(ranked_ids),
+                    output_field=IntegerField(),
+                )
+            )
+            ordering = ('search_rank', 'id')
     
-    paginator = Paginator(users, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    cursor_pagination = getattr(settings, 'BROWSE_PAGINATION', 'cursor') == 'cursor'
+    if cursor_pagination:
+        paginator = KeysetPaginator(users, 12, ordering=ordering,
+                                    count_cap=getattr(settings, 'BROWSE_APPROXIMATE_TOTAL_CAP', 1000))
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    else:
+        paginator = Paginator(users.order_by(*ordering), 12)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    
+    # Current filters, for building next/previous links
+    filter_params = request.GET.copy()
+    filter_params.pop('cursor', None)
+    filter_params.pop('page', None)
     
     context = {
         'form': form,
         'page_obj': page_obj,
+        'cursor_pagination': cursor_pagination,
+        'filter_querystring': filter_params.urlencode(),
     }
     return render(request, 'core/browse_users.html', context)
 
@@ -237,19 +262,38 @@ def user_profile(request, username):
     
     offered_skills = UserSkill.objects.filter(user=user, skill_type='offered').select_related('skill')
     wanted_skills = UserSkill.objects.filter(user=user, skill_type='wanted').select_related('skill')
-    ratings = Rating.objects.filter(rated_user=user).select_related('rater').order_by('-created_at')
-    avg_rating = ratings.aggregate(Avg('rating'))['rating__avg']
+    review_page = reviews.review_page(user, request.GET.get('reviews'))
+    
+    # How well the viewer and this user could swap with each other
+    skill_match = None
+    if request.user.is_authenticated and request.user != user:
+        skill_match = SkillMatch.objects.filter(user=request.user, matched_user=user).first()
     
     context = {
         'profile_user': user,
         'profile': profile,
         'offered_skills': offered_skills,
         'wanted_skills': wanted_skills,
-        'ratings': ratings,
-        'avg_rating': avg_rating,
+        'reviews': review_page,
+        'avg_rating': profile.average_rating,
+        'skill_match': skill_match,
     }
     return render(request, 'core/user_profile.html', context)
 
+def user_reviews(request, username):
+    """Next page of a user's reviews as JSON, for the profile page's "more reviews" button"""
+    user = get_object_or_404(User, username=username)
+    profile = get_object_or_404(UserProfile, user=user)
+    
+    if profile.visibility == 'private' and request.user != user:
+        return JsonResponse({'error': 'This profile is private.'}, status=403)
+    
+    review_page = reviews.review_page(user, request.GET.get('cursor'))
+    return JsonResponse({
+        'html': render_to_string('core/review_list.html', {'reviews': review_page}, request=request),
+        'next_cursor': review_page.next_cursor,
+    })
+
 @login_required
 def send_swap_request(request, username):
     receiver = get_object_or_404(User, username=username)
@@ -258,6 +302,10 @@ def send_swap_request(request, username):
         messages.error(request, "You can't send a swap request to yourself!")
         return redirect('user_profile', username=username)
     
+    # Skill ids only; names come from the skill catalog
+    offered_skill_ids = UserSkill.objects.filter(user=request.user, skill_type='offered').values_list('skill_id', flat=True)
+    wanted_skill_ids = list(UserSkill.objects.filter(user=receiver, skill_type='wanted').values_list('skill_id', flat=True))
+    
     if request.method == 'POST':
         form = SwapRequestForm(request.POST)
         if form.is_valid():
@@ -265,28 +313,35 @@ def send_swap_request(request, username):
             swap_request.requester = request.user
             swap_request.receiver = receiver
             swap_request.save()
+            tasks.record_swap_request.delay(swap_request.pk)
+            notifications.swap_requested(swap_request)
             messages.success(request, f'Swap request sent to {receiver.get_full_name() or receiver.username}!')
             return redirect('user_profile', username=username)
         else:
             messages.error(request, 'Please correct the errors in the form.')
     else:
-        # Get user's offered skills and receiver's wanted skills
-        offered_skills = UserSkill.objects.filter(user=request.user, skill_type='offered')
-        wanted_skills = UserSkill.objects.filter(user=receiver, skill_type='wanted')
+        # Dropdowns limited to the user's offered skills and the receiver's wanted skills
         form = SwapRequestForm()
-        form.fields['skill_offered'].queryset = Skill.objects.filter(userskill__in=offered_skills)
-        form.fields['skill_wanted'].queryset = Skill.objects.filter(userskill__in=wanted_skills)
+        form.fields['skill_offered'].choices = catalog.choices(offered_skill_ids)
+        form.fields['skill_wanted'].choices = catalog.choices(wanted_skill_ids)
     
     context = {
         'form': form,
         'receiver': receiver,
+        'receiver_wanted_skills': [catalog.skill_name(skill_id) for skill_id in wanted_skill_ids],
     }
     return render(request, 'core/send_swap_request.html', context)
 
 @login_required
 def swap_requests(request):
-    received_requests = SwapRequest.objects.filter(receiver=request.user).select_related('requester', 'skill_offered', 'skill_wanted').order_by('-created_at')
-    sent_requests = SwapRequest.objects.filter(requester=request.user).select_related('receiver', 'skill_offered', 'skill_wanted').order_by('-created_at')
+    # Skill names are rendered from the catalog, so skills are not joined;
+    # the other user's profile is, for the photo shown on every row
+    received_requests = SwapRequest.objects.filter(receiver=request.user).select_related(
+        'requester__userprofile'
+    ).order_by('-created_at')
+    sent_requests = SwapRequest.objects.filter(requester=request.user).select_related(
+        'receiver__userprofile'
+    ).order_by('-created_at')
     
     context = {
         'received_requests': received_requests,
@@ -310,33 +365,34 @@ def handle_swap_request(request, request_id, action):
         swap_request.status = 'rejected'
         messages.success(request, f'Swap request from {swap_request.requester.get_full_name() or swap_request.requester.username} rejected!')
     elif action == 'complete' and request.user in [swap_request.requester, swap_request.receiver]:
-        swap_request.status = 'completed'
-        # Award points
-        requester_profile, _ = UserProfile.objects.get_or_create(user=swap_request.requester)
-        receiver_profile, _ = UserProfile.objects.get_or_create(user=swap_request.receiver)
-        requester_profile.points += 10
-        receiver_profile.points += 10
-        requester_profile.save()
-        receiver_profile.save()
-        messages.success(request, 'Swap marked as completed! You both earned 10 points!')
+        # Status change and points award happen atomically, at most once per swap
+        if points.complete_swap(swap_request):
+            messages.success(request, f'Swap marked as completed! You both earned {points.SWAP_COMPLETION_POINTS} points!')
+        else:
+            messages.info(request, 'This swap has already been completed.')
+        return redirect('swap_requests')
     else:
         messages.error(request, 'Invalid action or unauthorized.')
         return redirect('swap_requests')
     
     swap_request.save()
+    notifications.swap_status_changed(swap_request)
     return redirect('swap_requests')
 
 @login_required
 def rate_user(request, request_id):
-    swap_request = get_object_or_404(SwapRequest, id=request_id, status='completed')
+    swap_request = get_object_or_404(
+        SwapRequest.objects.select_related('requester__userprofile', 'receiver__userprofile'),
+        id=request_id, status='completed',
+    )
     
     # Check if user is part of this swap
-    if request.user not in [swap_request.requester, swap_request.receiver]:
+    if request.user.pk not in [swap_request.requester_id, swap_request.receiver_id]:
         messages.error(request, 'You are not authorized to rate this swap.')
         return redirect('swap_requests')
     
     # Determine who to rate
-    rated_user = swap_request.receiver if request.user == swap_request.requester else swap_request.requester
+    rated_user = swap_request.receiver if request.user.pk == swap_request.requester_id else swap_request.requester
     
     # Check if already rated
     if Rating.objects.filter(swap_request=swap_request, rater=request.user).exists():
@@ -350,7 +406,10 @@ def rate_user(request, request_id):
             rating.swap_request = swap_request
             rating.rater = request.user
             rating.rated_user = rated_user
-            rating.save()
+            with transaction.atomic():
+                rating.save()
+                reviews.record(rating)
+                tasks.record_rating.delay(rating.pk)
             messages.success(request, f'Rating submitted for {rated_user.get_full_name() or rated_user.username}!')
             return redirect('swap_requests')
         else:
@@ -367,22 +426,11 @@ def rate_user(request, request_id):
 
 @login_required
 def messages_view(request):
-    # Get all conversations
-    conversations = Message.objects.filter(
-        Q(sender=request.user) | Q(receiver=request.user)
-    ).values('sender', 'receiver').distinct()
-    
-    # Get unique users in conversations
-    user_ids = set()
-    for conv in conversations:
-        user_ids.add(conv['sender'])
-        user_ids.add(conv['receiver'])
-    user_ids.discard(request.user.id)
-    
-    conversation_users = User.objects.filter(id__in=user_ids).select_related('userprofile')
+    # One indexed query over the user's threads, most recent first
+    inbox = conversations.inbox_page(request.user, request.GET.get('cursor'))
     
     context = {
-        'conversation_users': conversation_users,
+        'conversations': inbox,
     }
     return render(request, 'core/messages.html', context)
 
@@ -394,22 +442,10 @@ def chat_with_user(request, username):
         messages.error(request, "You can't chat with yourself!")
         return redirect('messages')
     
-    # Get messages between users
-    messages_list = Message.objects.filter(
-        Q(sender=request.user, receiver=other_user) |
-        Q(sender=other_user, receiver=request.user)
-    ).select_related('sender', 'receiver').order_by('created_at')
-    
-    # Mark messages as read
-    Message.objects.filter(sender=other_user, receiver=request.user, is_read=False).update(is_read=True)
-    
     if request.method == 'POST':
         form = MessageForm(request.POST)
         if form.is_valid():
-            message = form.save(commit=False)
-            message.sender = request.user
-            message.receiver = other_user
-            message.save()
+            conversations.send_message(request.user, other_user, form.cleaned_data['content'])
             messages.success(request, 'Message sent!')
             return redirect('chat_with_user', username=username)
         else:
@@ -417,6 +453,10 @@ def chat_with_user(request, username):
     else:
         form = MessageForm()
     
+    # Latest window of the thread; older messages are fetched by chat_history
+    messages_list = conversations.history_page(request.user, other_user)
+    conversations.mark_window_read(request.user, other_user, messages_list)
+    
     context = {
         'other_user': other_user,
         'messages_list': messages_list,
@@ -424,15 +464,48 @@ def chat_with_user(request, username):
     }
     return render(request, 'core/chat.html', context)
 
+@login_required
+def chat_history(request, username):
+    """Older chat messages as JSON, keyed on the (created_at, id) cursor of the oldest one shown"""
+    other_user = get_object_or_404(User, username=username)
+    
+    page = conversations.history_page(request.user, other_user, request.GET.get('cursor'))
+    conversations.mark_window_read(request.user, other_user, page)
+    return JsonResponse({
+        'html': render_to_string('core/chat_messages.html', {'messages_list': page}, request=request),
+        'next_cursor': page.next_cursor,
+    })
+
+@login_required
+async def notifications_stream(request):
+    """Server-Sent Events: unread counts and swap request updates for the current user"""
+    user = await request.auser()
+    initial_unread = await sync_to_async(unread.get)(user.pk)
+    response = StreamingHttpResponse(
+        notifications.stream(user.pk, initial_unread), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let nginx pass events through unbuffered
+    return response
+
 @login_required
 def leaderboard(request):
-    top_users = UserProfile.objects.filter(is_banned=False).select_related('user').order_by('-points')[:20]
+    period = request.GET.get('period', 'all')
+    if period not in dict(LeaderboardRollup.PERIOD_CHOICES):
+        period = 'all'
+    category = request.GET.get('category', '')
+    
+    top_users = rollups.top(period=period, category=category, limit=20)
     user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
-    user_rank = UserProfile.objects.filter(points__gt=user_profile.points, is_banned=False).count() + 1
+    user_rank = ranking.rank_for_points(user_profile.points)
     
     context = {
         'top_users': top_users,
         'user_rank': user_rank,
+        'period': period,
+        'category': category,
+        'periods': LeaderboardRollup.PERIOD_CHOICES,
+        'categories': rollups.categories(),
     }
     return render(request, 'core/leaderboard.html', context)
 
@@ -0,0 +1,35 @@
+"""
+Process pools for CPU-bound work (match rebuilds, photo backfills, tasks).
+
+Pools use the platform's default start method: fork is not available on
+Windows and is unsafe on macOS once the parent runs threads (the session
+flush timer, the task runner's pool), so children there start a fresh
+interpreter. Each child therefore runs django.setup() and opens its own
+database connections. State for the children is passed to `initializer`
+pickled, because unpickling project objects needs the app registry that
+django.setup() loads.
+"""
+import multiprocessing
+import pickle
+
+import django
+from django.db import connections
+from django.utils.module_loading import import_string
+
+
+def _start(initializer, payload):
+    # Already set up when forked; a no-op then
+    django.setup()
+    if initializer is not None:
+        import_string(initializer)(*pickle.loads(payload))
+
+
+def pool(processes, initializer=None, initargs=()):
+    """
+    A multiprocessing Pool of Django-ready children. `initializer` is the
+    dotted path of a function called with `initargs` in each child.
+    """
+    # Children must not share (or, when forked, inherit) the parent's connections
+    connections.close_all()
+    context = multiprocessing.get_context()
+    return context.Pool(processes=processes, initializer=_start, initargs=(initializer, pickle.dumps(initargs)))
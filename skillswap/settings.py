@@ -10,17 +10,21 @@ DEBUG = True
 ALLOWED_HOSTS = ['*']
 
 INSTALLED_APPS = [
+    'daphne',  # runserver serves ASGI, including WebSockets
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'channels',
     'core',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -49,6 +53,16 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'skillswap.wsgi.application'
+ASGI_APPLICATION = 'skillswap.asgi.application'
+
+# Channel layer for WebSocket chat. The in-memory layer needs no broker but
+# only reaches sockets in the same process; use channels_redis's
+# RedisChannelLayer when running several ASGI workers.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 # MySQL Database Configuration
 DATABASES = {
@@ -94,6 +108,18 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [STATIC_DIR]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic writes content-hashed names plus gzip (and brotli, if the
+# brotli package is installed) copies; StaticFilesMiddleware serves them
+# with immutable caching (see core.staticfiles)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -109,7 +135,61 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
 
+# Cache. Local memory is per process; use Redis or Memcached when running
+# several workers so cached counters are shared.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'skillswap',
+    },
+    # Sessions live here first (see core.sessions), so keep them out of the
+    # default cache's evictions. Point it at Redis or Memcached: with a
+    # process-local cache core.sessions falls back to database sessions
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'skillswap-sessions',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+UNREAD_CACHE_TIMEOUT = 300  # seconds a cached unread count is trusted
+HOME_CACHE_TIMEOUT = 600  # home page stats and fragments; also invalidated on change
+SKILL_CATALOG_MAX_AGE = 60  # seconds a process keeps its skill catalog without a version bump
+
 # Session settings
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+
+# Cache-first sessions: logins are written to the database at once, other
+# changes in batches, and a sliding expiry only once it is this close to
+# running out. Set SESSION_ENGINE to 'django.contrib.sessions.backends.db'
+# to go back to a database write on every request.
+SESSION_ENGINE = 'core.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_REFRESH_THRESHOLD = SESSION_COOKIE_AGE // 2  # seconds
+SESSION_FLUSH_BATCH = 100  # buffered sessions per bulk UPDATE
+SESSION_FLUSH_INTERVAL = 30  # seconds a change may wait in the buffer
+
+# Task queue (see core.taskqueue); run workers with manage.py run_tasks.
+# TASKS_EAGER runs tasks in the web process after commit instead.
+TASKS_EAGER = False
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10  # seconds before the first retry; doubles per failure
+TASK_RETRY_MAX_DELAY = 3600
+TASK_LOCK_TIMEOUT = 600  # seconds before a claimed task counts as abandoned
+
+# expire_swap_requests cancels pending/accepted requests unchanged this
+# long, or this long past their scheduled date (see core.expiry)
+SWAP_REQUEST_MAX_AGE_DAYS = 30
+SWAP_REQUEST_SCHEDULE_GRACE_DAYS = 7
+
+# Browse pagination: 'cursor' (keyset, constant cost at any depth) or 'page'
+BROWSE_PAGINATION = 'cursor'
+BROWSE_APPROXIMATE_TOTAL_CAP = 1000  # COUNT stops here; shown as "1000+"
+
+# Query budgets per URL name (see core.querybudget). 'warn' logs requests
+# over budget, 'raise' fails them, None disables the middleware.
+QUERY_BUDGET_ACTION = 'warn'
+QUERY_BUDGETS = {
+    'default': {'queries': 20, 'db_time_ms': 250, 'repeats': 2},
+}